@@ -10,6 +10,10 @@ Solution
 Discussion
     why not use set?
         because, it doesn't preserve ordering.
+Extension
+    The set of seen keys grows without limit. dedupe() can be given any object with
+    __contains__() and add() instead: a BloomFilter (fixed memory, tunable false positive
+    rate) or a WindowedSet (exact, but only remembers the last N keys or T seconds).
 """
 
 __author__ = 'Frankie Fu'
@@ -32,8 +36,8 @@ print(list(dedupe(a)))
 
 # If you are trying to eliminate duplicates in a sequence of unhashable types(such as dicts),
 # you can make a slight change to this recipe, as follows:
-def dedupe(items, key=None):
-    seen = set()
+def dedupe(items, key=None, seen=None):
+    seen = set() if seen is None else seen
     for item in items:
         val = item if key is None else key(item)
         if val not in seen:
@@ -52,3 +56,191 @@ print(list(dedupe(a, key=lambda d: (d['x'], d['y']))))
 a = [1, 5, 2, 1, 9, 1, 5, 10]
 print(set(a))
 # However, it doesn't preserve any kind of ordering.
+
+
+# Extension: bounded memory backends
+# On a stream of billions of events the 'seen' set eventually holds every key. The
+# function only needs two operations from it, 'in' and add(), so it can be handed a
+# different container that trades exactness or history for memory, through the seen
+# argument of dedupe() above.
+import math
+import time
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# A Bloom filter answers "definitely not seen" or "probably seen". It never lets a
+# duplicate through, but drops a fraction error_rate of the new items as false positives.
+# Memory is fixed at about 1.44*log2(1/error_rate) bits per expected key.
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+
+
+def _mix64(x):
+    # splitmix64 finaliser; also used by the NumPy path so both agree on integer keys
+    x = (x + 0x9E3779B97F4A7C15) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.nbits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.nhashes = max(1, round(self.nbits / capacity * math.log(2)))
+        self._bits = bytearray((self.nbits + 7) // 8)
+
+    def _hashes(self, key):
+        # Double hashing: k positions are derived from the two halves of one 64-bit hash.
+        # A float equal to an int is hashed as that int, since a set treats them as one.
+        if isinstance(key, float) and key.is_integer():
+            key = int(key)
+        h = _mix64(key & _MASK64) if isinstance(key, int) else hash((key,)) & _MASK64
+        return h & 0xFFFFFFFF, (h >> 32) | 1
+
+    def __contains__(self, key):
+        h1, h2 = self._hashes(key)
+        bits, nbits = self._bits, self.nbits
+        for i in range(self.nhashes):
+            p = (h1 + i * h2) % nbits
+            if not bits[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+    def add(self, key):
+        h1, h2 = self._hashes(key)
+        bits, nbits = self._bits, self.nbits
+        for i in range(self.nhashes):
+            p = (h1 + i * h2) % nbits
+            bits[p >> 3] |= 1 << (p & 7)
+
+    def _array_positions(self, values):
+        # Integer arrays only: their values are hashed exactly as the scalar path hashes
+        # the same ints. astype() would truncate floats and fails on strings.
+        if values.dtype.kind not in 'biu':
+            raise TypeError(f'contains_array() and add_array() need an integer array, '
+                            f'not {values.dtype}')
+        h = values.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+        h = (h ^ (h >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        h = (h ^ (h >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        h ^= h >> np.uint64(31)
+        h1, h2 = h & np.uint64(0xFFFFFFFF), (h >> np.uint64(32)) | np.uint64(1)
+        i = np.arange(self.nhashes, dtype=np.uint64)
+        return (h1[:, None] + i * h2[:, None]) % np.uint64(self.nbits)
+
+    def contains_array(self, values):
+        pos = self._array_positions(values)
+        bits = np.frombuffer(self._bits, dtype=np.uint8)
+        return ((bits[pos >> np.uint64(3)] >> (pos & np.uint64(7)).astype(np.uint8)) & 1).all(axis=1)
+
+    def add_array(self, values):
+        pos = self._array_positions(values).ravel()
+        bits = np.frombuffer(self._bits, dtype=np.uint8)
+        np.bitwise_or.at(bits, pos >> np.uint64(3), (1 << (pos & np.uint64(7))).astype(np.uint8))
+
+    def nbytes(self):
+        return len(self._bits)
+
+
+# An exact dedupe that forgets old keys. Either a count window (the last maxlen distinct
+# keys) or a time window (keys seen in the last ttl seconds), or both. OrderedDict keeps
+# keys in insertion order, so the oldest is always popitem(last=False) away.
+class WindowedSet:
+    def __init__(self, maxlen=None, ttl=None, clock=time.monotonic):
+        self.maxlen = maxlen
+        self.ttl = ttl
+        self._clock = clock
+        self._keys = OrderedDict()
+
+    def _expire(self):
+        if self.ttl is not None:
+            cutoff = self._clock() - self.ttl
+            keys = self._keys
+            while keys and next(iter(keys.values())) < cutoff:
+                keys.popitem(last=False)
+
+    def __contains__(self, key):
+        self._expire()
+        return key in self._keys
+
+    def add(self, key):
+        keys = self._keys
+        keys[key] = self._clock()
+        keys.move_to_end(key)
+        if self.maxlen is not None and len(keys) > self.maxlen:
+            keys.popitem(last=False)
+
+    def __len__(self):
+        return len(self._keys)
+
+
+# Example use
+a = [1, 5, 2, 1, 9, 1, 5, 10]
+print(list(dedupe(a, seen=BloomFilter(100, error_rate=0.01))))
+# [1, 5, 2, 9, 10]
+print(list(dedupe(a, seen=WindowedSet(maxlen=2))))
+# [1, 5, 2, 1, 9, 5, 10]
+
+
+# Bulk mode for integer ids that arrive in NumPy arrays (or in raw bytes, via
+# np.frombuffer(buf, dtype=np.int64)). Duplicates inside the batch are removed with
+# np.unique(), and a BloomFilter checks the whole batch with array operations.
+def dedupe_array(values, seen):
+    _, first = np.unique(values, return_index=True)
+    first.sort()
+    candidates = values[first]
+    if hasattr(seen, 'contains_array'):
+        new = candidates[~seen.contains_array(candidates)]
+        seen.add_array(new)
+        return new
+    new = [v for v in candidates.tolist() if v not in seen]
+    for v in new:
+        seen.add(v)
+    return np.array(new, dtype=values.dtype)
+
+
+if np is not None:
+    print(dedupe_array(np.array(a), BloomFilter(100, error_rate=0.01)))
+    # [ 1  5  2  9 10]
+
+
+# Memory and throughput of each backend on a stream with 50% duplicates. Memory is the
+# size of the container itself; the keys are small ints shared with the input list.
+def bench_dedupe(n=1000000, batch=100000):
+    import random
+    import sys
+
+    keys = [random.randrange(n // 2) for _ in range(n)]
+    unique = len(set(keys))
+    backends = [
+        ('set', set),
+        ('bloom 1%', lambda: BloomFilter(n // 2, error_rate=0.01)),
+        ('window 10k', lambda: WindowedSet(maxlen=10000)),
+    ]
+    for label, make in backends:
+        start = time.perf_counter()
+        seen = make()
+        kept = sum(1 for _ in dedupe(keys, seen=seen))
+        elapsed = time.perf_counter() - start
+        memory = seen.nbytes() if isinstance(seen, BloomFilter) else sys.getsizeof(
+            seen if isinstance(seen, set) else seen._keys)
+        print(f'{label:12} kept {kept} of {unique} unique, {n / elapsed / 1e6:.2f} M items/s, '
+              f'{memory / 2 ** 20:.1f} MB')
+
+    if np is not None:
+        array = np.array(keys, dtype=np.int64)
+        for label, make in backends[:2]:
+            seen = make()
+            start = time.perf_counter()
+            kept = sum(len(dedupe_array(array[i:i + batch], seen)) for i in range(0, n, batch))
+            elapsed = time.perf_counter() - start
+            print(f'{label:12} dedupe_array kept {kept}, {n / elapsed / 1e6:.2f} M items/s')
+
+
+if __name__ == '__main__':
+    bench_dedupe()
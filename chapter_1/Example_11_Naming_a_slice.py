@@ -9,6 +9,10 @@ Solution
         SHARES = slice(20, 23)
 Discussion
     indices(size) method
+Extension
+    FixedWidthLayout turns a set of named slices into a parser for a whole buffer of
+    fixed-width records. With NumPy the buffer is viewed through a structured dtype, so
+    no substring is created per field; without it struct.iter_unpack() does the slicing.
 """
 
 __author__ = 'Frankie Fu'
@@ -53,4 +57,171 @@ s = 'HelloWorld'
 print(a.indices(len(s)))
 
 for i in range(*a.indices(len(s))):
-    print(s[i])
\ No newline at end of file
+    print(s[i])
+
+
+# Extension: decoding a whole file of fixed-width records
+# record[SHARES] creates a new string for every field of every record, and int()/float()
+# are then called one value at a time. When all records have the same length, the named
+# slices describe a record layout that can be applied to the entire buffer at once. A
+# NumPy structured dtype with one field per slice (at the slice's offset) views the buffer
+# in place, and astype() converts a whole column from text to numbers in C.
+import mmap
+import struct
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class FixedWidthLayout:
+    def __init__(self, record_size, **fields):
+        # fields: name=(slice, type) with type one of int, float, str or bytes.
+        # record_size includes the line terminator, if the records have one.
+        self.record_size = record_size
+        self.fields = {}
+        for name, (field, kind) in fields.items():
+            start, stop, step = field.indices(record_size)
+            if step != 1 or stop <= start:
+                raise ValueError(f'field {name!r} must be a contiguous slice')
+            self.fields[name] = (start, stop, kind)
+        ordered = sorted(self.fields.items(), key=lambda item: item[1][0])
+        self._names = [name for name, _ in ordered]
+        # struct format for the fallback: pad bytes between fields, 'Ns' for each field
+        fmt, pos = [], 0
+        for _, (start, stop, _) in ordered:
+            if start < pos:
+                raise ValueError('fields must not overlap')
+            fmt.append(f'{start - pos}x{stop - start}s')
+            pos = stop
+        fmt.append(f'{record_size - pos}x')
+        self._fields_end = pos
+        self._struct = struct.Struct(''.join(fmt))
+        if np is not None:
+            self._dtype = np.dtype({
+                'names': list(self.fields),
+                'formats': [f'S{stop - start}' for start, stop, _ in self.fields.values()],
+                'offsets': [start for start, _, _ in self.fields.values()],
+                'itemsize': record_size,
+            })
+
+    def parse(self, buf):
+        # Returns {name: column} for every record in buf (bytes, bytearray, memoryview or
+        # mmap). A final record without its terminator is padded; one that ends before
+        # its last field is an error.
+        view = memoryview(buf)
+        size = self.record_size
+        whole = len(view) - len(view) % size
+        if whole < len(view) and len(view) - whole < self._fields_end:
+            raise ValueError(f'truncated record at offset {whole}')
+        columns = self._parse_records(view[:whole])
+        if whole < len(view):
+            tail = self._parse_records(bytes(view[whole:]).ljust(size))
+            columns = {name: _concat(columns[name], tail[name]) for name in columns}
+        return columns
+
+    def _parse_records(self, view):
+        if np is not None:
+            records = np.frombuffer(view, dtype=self._dtype)
+            return {name: _convert_array(records[name], kind)
+                    for name, (_, _, kind) in self.fields.items()}
+        columns = dict(zip(self._names, zip(*self._struct.iter_unpack(view))))
+        return {name: _convert_list(columns.get(name, ()), kind)
+                for name, (_, _, kind) in self.fields.items()}
+
+    def parse_file(self, filename):
+        with open(filename, 'rb') as f:
+            if not f.seek(0, 2):
+                return self.parse(b'')
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                # Columns must not refer to the mapping once it is closed
+                columns = self._detach(self.parse(buf))
+        return columns
+
+    def iter_chunks(self, f, records_per_chunk=65536):
+        # Streams a binary file: each chunk is read into the same buffer and parsed. A
+        # short read is not the end of the file; only a read of 0 bytes is, and a record
+        # split between two reads is carried over to the next chunk.
+        size = self.record_size
+        buf = bytearray(size * records_per_chunk)
+        view = memoryview(buf)
+        filled = 0
+        while True:
+            n = f.readinto(view[filled:])
+            filled += n
+            if n and filled < len(buf):
+                continue
+            if filled:
+                whole = filled - filled % size if n else filled
+                # The buffer is reused, so no column may be a view of it
+                yield self._detach(self.parse(view[:whole]))
+                view[:filled - whole] = view[whole:filled]
+                filled -= whole
+            if not n:
+                break
+
+    def _detach(self, columns):
+        # bytes columns from the NumPy path are views of the buffer, the others are new
+        return {name: column.copy() if np is not None and isinstance(column, np.ndarray)
+                and self.fields[name][2] is bytes else column
+                for name, column in columns.items()}
+
+
+def _convert_array(column, kind):
+    if kind is bytes:
+        return column
+    if kind is str:
+        return column.astype(str)
+    return column.astype(np.int64 if kind is int else np.float64)
+
+
+def _convert_list(column, kind):
+    if kind is bytes:
+        return list(column)
+    if kind is str:
+        return [value.decode('ascii') for value in column]
+    return list(map(kind, column))
+
+
+def _concat(a, b):
+    return np.concatenate([a, b]) if np is not None and isinstance(a, np.ndarray) else a + b
+
+
+# Example use: the record from above, repeated with a newline after each one
+records = ''.join(f'....................{n:3d}.................{p:6.2f} ..........\n'
+                  for n, p in [(100, 513.25), (20, 91.1), (5, 12.0)]).encode('ascii')
+layout = FixedWidthLayout(len(record) + 1, shares=(SHARES, int), price=(PRICE, float))
+columns = layout.parse(records)
+print(columns['shares'], columns['price'])
+print(sum(s * p for s, p in zip(columns['shares'], columns['price'])))
+# 53207.0
+
+
+def bench_fixed_width(n=1000000):
+    import io
+    import time
+
+    data = records * (n // 3)
+    start = time.perf_counter()
+    total = 0.0
+    for line in io.BytesIO(data):
+        total += int(line[SHARES]) * float(line[PRICE])
+    print(f'line by line with named slices: {time.perf_counter() - start:.3f}s')
+
+    start = time.perf_counter()
+    columns = layout.parse(data)
+    if np is not None:
+        total = float(np.dot(columns['shares'], columns['price']))
+    else:
+        total = sum(map(lambda s, p: s * p, columns['shares'], columns['price']))
+    print(f'FixedWidthLayout.parse():       {time.perf_counter() - start:.3f}s')
+
+    start = time.perf_counter()
+    for chunk in layout.iter_chunks(io.BytesIO(data)):
+        pass
+    print(f'FixedWidthLayout.iter_chunks(): {time.perf_counter() - start:.3f}s')
+
+
+if __name__ == '__main__':
+    bench_fixed_width()
@@ -16,6 +16,12 @@ Solution
 Discussion
     Counter objects are a tremendously useful tool for almost any kind of problem where you need to
     tabulate and count data. You should prefer this over manually written solutions involving dictionaries.
+Extension
+    A Counter keeps one entry per distinct item. For high-cardinality streams, HeavyHitters
+    keeps a fixed amount of memory and still reports the frequent items with error bounds:
+        SpaceSaving: k counters; exact items, count overestimated by at most 'error'.
+        CountMinSketch: a depth x width table of counters; works for any key space.
+    Summaries built in separate processes combine with + and - like Counters do.
 """
 
 __author__ = 'Frankie Fu'
@@ -62,4 +68,239 @@ print(b)
 print(a + b)
 
 # Subtract count
-print(a - b)
\ No newline at end of file
+print(a - b)
+
+
+# Extension: heavy hitters in bounded memory
+# Most of a Counter's memory goes to items that occur once or twice. If only the most
+# common items matter, a summary of fixed size is enough, at the price of approximate
+# counts. Every summary below reports (item, count, error), meaning the true count is
+# between count - error and count.
+import heapq
+import math
+from abc import ABCMeta, abstractmethod
+from array import array
+from hashlib import blake2b
+
+
+class HeavyHitters(metaclass=ABCMeta):
+    def __init__(self):
+        self.total = 0
+
+    def update(self, items):
+        for item in items:
+            self.add(item)
+
+    @abstractmethod
+    def add(self, item, count=1):
+        pass
+
+    @abstractmethod
+    def most_common(self, n=None):
+        pass
+
+
+# Space-Saving (Metwally et al.) monitors at most k items. A new item that arrives when
+# all k slots are taken replaces the item with the smallest count and inherits that
+# count as its error. Any item whose true count exceeds total/k is guaranteed to be kept.
+class SpaceSaving(HeavyHitters):
+    def __init__(self, k=100):
+        super().__init__()
+        self.k = k
+        self._counts = {}
+        self._errors = {}
+        # Lazy min-heap of (count, item). Counts only grow, so an entry that is out of date
+        # is simply pushed again with its current count when it reaches the top.
+        self._heap = []
+
+    def add(self, item, count=1):
+        self.total += count
+        counts = self._counts
+        if item in counts:
+            counts[item] += count
+        elif len(counts) < self.k:
+            counts[item] = count
+            self._errors[item] = 0
+            heapq.heappush(self._heap, (count, id(item), item))
+        else:
+            floor, victim = self._pop_min()
+            del counts[victim], self._errors[victim]
+            counts[item] = floor + count
+            self._errors[item] = floor
+            heapq.heappush(self._heap, (floor + count, id(item), item))
+
+    def _pop_min(self):
+        heap, counts = self._heap, self._counts
+        while True:
+            count, _, item = heapq.heappop(heap)
+            if counts.get(item) == count:
+                return count, item
+            if item in counts:
+                heapq.heappush(heap, (counts[item], id(item), item))
+
+    def _floor(self):
+        # Smallest monitored count; an item that is not monitored occurred at most this often
+        return min(self._counts.values()) if len(self._counts) >= self.k else 0
+
+    def __getitem__(self, item):
+        return self._counts.get(item, 0)
+
+    def most_common(self, n=None):
+        top = heapq.nlargest(len(self._counts) if n is None else n, self._counts.items(),
+                             key=lambda kv: kv[1])
+        return [(item, count, self._errors[item]) for item, count in top]
+
+    @classmethod
+    def _from(cls, k, total, counts, errors):
+        result = cls(k)
+        result.total = total
+        keep = heapq.nlargest(k, counts, key=counts.get)
+        result._counts = {item: counts[item] for item in keep}
+        result._errors = {item: errors[item] for item in keep}
+        result._heap = [(c, id(item), item) for item, c in result._counts.items()]
+        heapq.heapify(result._heap)
+        return result
+
+    def __add__(self, other):
+        # Mergeable summary (Agarwal et al.): an item missing from one side may still have
+        # occurred up to that side's floor count, so the floor is added as error.
+        f1, f2 = self._floor(), other._floor()
+        counts, errors = {}, {}
+        # Items in first-seen order rather than a set, so ties come out the same every run
+        for item in [*self._counts, *(i for i in other._counts if i not in self._counts)]:
+            counts[item] = self._counts.get(item, f1) + other._counts.get(item, f2)
+            errors[item] = self._errors.get(item, f1) + other._errors.get(item, f2)
+        return self._from(max(self.k, other.k), self.total + other.total, counts, errors)
+
+    def __sub__(self, other):
+        # Like Counter, keep only items whose count stays positive. Subtracting the lower
+        # bound of the other count keeps the result an upper bound.
+        f2 = other._floor()
+        counts, errors = {}, {}
+        for item, c in self._counts.items():
+            low = other._counts[item] - other._errors[item] if item in other._counts else 0
+            high = other._counts.get(item, f2)
+            if c - low > 0:
+                counts[item] = c - low
+                errors[item] = self._errors[item] + high - low
+        return self._from(self.k, max(0, self.total - other.total), counts, errors)
+
+
+# Count-Min sketch (Cormode and Muthukrishnan) adds every item to one counter in each of
+# depth rows. Collisions only ever inflate a counter, so the smallest of the depth
+# counters is the estimate. With probability 1 - exp(-depth) it is off by at most
+# e/width * total. The sketch itself cannot list its items, so the k items with the
+# highest estimates are tracked alongside it.
+class CountMinSketch(HeavyHitters):
+    def __init__(self, k=100, width=2048, depth=4):
+        super().__init__()
+        self.k = k
+        self.width = width
+        self.depth = depth
+        self._table = [array('q', bytes(8 * width)) for _ in range(depth)]
+        self._top = {}
+
+    def _columns(self, item):
+        # blake2b rather than hash(), so sketches from different processes line up
+        key = item.encode('utf-8') if isinstance(item, str) else item if isinstance(item, bytes) else repr(item).encode('utf-8')
+        digest = blake2b(key, digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def _estimate(self, columns):
+        return min(row[c] for row, c in zip(self._table, columns))
+
+    def add(self, item, count=1):
+        self.total += count
+        columns = self._columns(item)
+        for row, c in zip(self._table, columns):
+            row[c] += count
+        self._track(item, self._estimate(columns))
+
+    def _track(self, item, estimate):
+        top = self._top
+        top[item] = estimate
+        if len(top) > 2 * self.k:
+            # Pruning in bulk keeps the amortised cost per item low
+            self._top = {i: top[i] for i in heapq.nlargest(self.k, top, key=top.get)}
+
+    def __getitem__(self, item):
+        return self._estimate(self._columns(item))
+
+    def error_bound(self):
+        return math.ceil(math.e / self.width * self.total)
+
+    def most_common(self, n=None):
+        error = self.error_bound()
+        estimates = {item: self[item] for item in self._top}
+        top = heapq.nlargest(self.k if n is None else n, estimates.items(), key=lambda kv: kv[1])
+        return [(item, count, error) for item, count in top]
+
+    def _combine(self, other, sign):
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError('sketches must have the same width and depth')
+        result = CountMinSketch(max(self.k, other.k), self.width, self.depth)
+        result.total = max(0, self.total + sign * other.total)
+        for out, a, b in zip(result._table, self._table, other._table):
+            out[:] = array('q', (max(0, x + sign * y) for x, y in zip(a, b)))
+        for item in self._top.keys() | other._top.keys():
+            estimate = result[item]
+            if estimate > 0:
+                result._track(item, estimate)
+        return result
+
+    def __add__(self, other):
+        return self._combine(other, 1)
+
+    def __sub__(self, other):
+        return self._combine(other, -1)
+
+
+# Example use: the same words fed to two shards, as if counted by two processes
+a = SpaceSaving(k=10)
+a.update(words)
+b = SpaceSaving(k=10)
+b.update(morewords)
+print((a + b).most_common(3))
+# [('eyes', 9, 0), ('the', 5, 0), ('look', 4, 0)]
+print(Counter(words + morewords).most_common(3))
+# [('eyes', 9), ('the', 5), ('look', 4)]
+
+# With fewer slots than distinct words the counts become upper bounds
+small = SpaceSaving(k=4)
+small.update(words)
+print(small.most_common(2))
+# [('eyes', 8, 0), ('the', 7, 2)] - 'the' really occurs between 7 - 2 and 7 times
+
+sketch = CountMinSketch(k=5, width=64, depth=4)
+sketch.update(words)
+print(sketch.most_common(3))
+print(sketch['eyes'], sketch.error_bound())
+
+
+# Throughput and memory against Counter on a Zipf-like stream with many rare items
+def bench_heavy_hitters(n=500000, k=1000):
+    import random
+    import sys
+    import time
+
+    # Half the stream is a skewed distribution, half is items that are seen only once
+    stream = [int(random.paretovariate(1.2)) if random.random() < 0.5 else random.randrange(10 ** 12)
+              for _ in range(n)]
+    exact = {w for w, _ in Counter(stream).most_common(10)}
+    for label, make in [('Counter', Counter), ('SpaceSaving', lambda: SpaceSaving(k)),
+                        ('CountMin', lambda: CountMinSketch(k))]:
+        start = time.perf_counter()
+        summary = make()
+        summary.update(stream)
+        elapsed = time.perf_counter() - start
+        top = {row[0] for row in summary.most_common(10)}
+        memory = sys.getsizeof(summary._counts if isinstance(summary, SpaceSaving) else summary)
+        if isinstance(summary, CountMinSketch):
+            memory = sum(len(row) * row.itemsize for row in summary._table)
+        print(f'{label:12} {n / elapsed / 1e6:.2f} M items/s, ~{memory / 1024:.0f} KB, '
+              f'top-10 recall: {len(top & exact) / 10:.0%}')
+
+
+if __name__ == '__main__':
+    bench_heavy_hitters()
@@ -48,10 +48,31 @@ print(rows_by_lfname)
 # Discussion
 # The functionality of itemgetter() is sometimes replaced by lambda expressions.
 rows_by_fname = sorted(rows, key=lambda r: r['fname'])
-rows_by_uid = sorted(rows,key=lambda r: (r['lname', r'fname']))
+rows_by_uid = sorted(rows,key=lambda r: (r['lname'], r['fname']))
 
 # applied to functions such as min() and max()
 print('min: ', min(rows, key=itemgetter('uid')))
 print('max: ', max(rows, key=lambda r: r['uid']))
 
 
+# Extension
+# For millions of rows, a list of dicts is both large and slow to sort, since every key
+# is looked up row by row. record_table.RecordTable keeps one typed array per field and
+# sorts on whole columns (with NumPy when it is installed).
+from record_table import RecordTable
+
+table = RecordTable.from_dicts(rows)
+print(list(table.sort('lname', 'fname').to_dicts()) == rows_by_lfname)
+# True
+
+# Mixing ascending and descending keys normally takes either negated numbers or one
+# sorted() call per key. multisort.multisort() takes field names, with a leading '-'
+# for descending, and extracts each key into a column once instead of building tuples.
+# external_sort() does the same for data that does not fit in memory.
+from multisort import multisort, external_sort
+
+print(multisort(rows, ['lname', '-uid']))
+# [{'fname': 'David', 'lname': 'Beazley', 'uid': 1002}, {'fname': 'John', 'lname': 'Cleese', 'uid': 1001},
+#  {'fname': 'Big', 'lname': 'Jones', 'uid': 1004}, {'fname': 'Brian', 'lname': 'Jones', 'uid': 1003}]
+print(list(external_sort(rows, ['-uid'], chunk_size=2)) == sorted(rows, key=itemgetter('uid'), reverse=True))
+# True
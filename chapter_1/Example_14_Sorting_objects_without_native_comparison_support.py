@@ -52,4 +52,12 @@ print('lambda by_name: ', sorted(users, key=lambda u: (u.lname, u.fname)))
 # such as min() and max().
 print(min(users, key=attrgetter('user_id')))
 
-print(max(users, key=attrgetter('user_id')))
\ No newline at end of file
+print(max(users, key=attrgetter('user_id')))
+
+# Extension
+# multisort.multisort() accepts attribute names with attrs=True, and a leading '-' sorts
+# that key in descending order, which attrgetter() alone cannot express.
+from multisort import multisort
+
+print(multisort(users, ['lname', '-user_id'], attrs=True))
+# [User(3, David, Beazley), User(99, John, Cleese), User(23, Brian, Jones)]
@@ -18,6 +18,11 @@ Discussion
     defaultdict():
         If your goal is to simply group the data together by dates into a large data structure
         that allows random access.
+Extension
+    GroupBy aggregates each group while scanning (count/sum/min/max/mean/first/last), so
+    neither sorting nor a list of rows per key is needed. Partial results can be spilled
+    to disk in hash partitions when there are too many keys, and input that is already
+    sorted goes through groupby() without keeping a table at all.
 """
 
 __author__ = 'Frankie Fu'
@@ -65,4 +70,183 @@ for r in rows_by_date['07/01/2012']:
 # is no concern, it may be faster to do this than to sort the records and iterate using groupby().
 
 
+# Extension: aggregating groups without sorting or storing rows
+# Often the rows of a group are only needed to compute a few numbers from them. Those
+# numbers can be updated row by row in a dict keyed by the group, which is O(n) and keeps
+# one small state per key instead of every row. Each aggregate is described by four
+# functions: start a state from the first value, step it with another value, merge two
+# partial states, and turn the final state into the answer.
+import operator
+import pickle
+import tempfile
+from collections.abc import Sequence
+from itertools import islice
 
+_AGGREGATES = {
+    'count': (lambda v: 1, lambda s, v: s + 1, operator.add, None),
+    'sum': (lambda v: v, operator.add, operator.add, None),
+    'min': (lambda v: v, min, min, None),
+    'max': (lambda v: v, max, max, None),
+    'mean': (lambda v: [v, 1], lambda s, v: [s[0] + v, s[1] + 1],
+             lambda a, b: [a[0] + b[0], a[1] + b[1]], lambda s: s[0] / s[1]),
+    'first': (lambda v: v, lambda s, v: s, lambda a, b: a, None),
+    'last': (lambda v: v, lambda s, v: v, lambda a, b: b, None),
+}
+
+
+class GroupBy:
+    def __init__(self, key, max_keys=None, partitions=16, **aggregates):
+        # Each aggregate is given as name=(operation, field), where field is a dict key,
+        # a callable, or left out to use the whole row (handy for 'count').
+        self.key = key
+        self.max_keys = max_keys
+        self.partitions = partitions
+        self._specs = []
+        for name, (op, *field) in aggregates.items():
+            field = field[0] if field else None
+            getter = field if callable(field) or field is None else itemgetter(field)
+            self._specs.append((name, getter) + _AGGREGATES[op])
+        self._table = {}
+        self._spill_files = None
+
+    def _start(self, row):
+        return [start(row if getter is None else getter(row))
+                for _, getter, start, *_ in self._specs]
+
+    def add(self, row):
+        self.update((row,))
+
+    def update(self, rows):
+        key, table = self.key, self._table
+        steps = [(i, getter, step) for i, (_, getter, _, step, *_) in enumerate(self._specs)]
+        for row in rows:
+            k = key(row)
+            state = table.get(k)
+            if state is None:
+                table[k] = self._start(row)
+                if self.max_keys is not None and len(table) > self.max_keys:
+                    self._spill()
+            else:
+                for i, getter, step in steps:
+                    state[i] = step(state[i], row if getter is None else getter(row))
+
+    def _spill(self):
+        # Write the partial states out, split by hash(key), so each partition can later be
+        # merged on its own with only a fraction of the keys in memory.
+        if self._spill_files is None:
+            self._spill_files = [tempfile.TemporaryFile() for _ in range(self.partitions)]
+        parts = [[] for _ in range(self.partitions)]
+        for k, state in self._table.items():
+            parts[hash(k) % self.partitions].append((k, state))
+        for f, part in zip(self._spill_files, parts):
+            if part:
+                pickle.dump(part, f, pickle.HIGHEST_PROTOCOL)
+        self._table.clear()
+
+    def _finish(self, state):
+        return {spec[0]: state[i] if spec[5] is None else spec[5](state[i])
+                for i, spec in enumerate(self._specs)}
+
+    def results(self):
+        # Hands out the groups added so far and starts over with an empty table, so the
+        # same GroupBy can be used again
+        if self._spill_files is not None:
+            self._spill()
+        table, spill_files = self._table, self._spill_files
+        self._table, self._spill_files = {}, None
+        if spill_files is None:
+            for k, state in table.items():
+                yield k, self._finish(state)
+            return
+        for f in spill_files:
+            f.seek(0)
+            merged = {}
+            while True:
+                try:
+                    part = pickle.load(f)
+                except EOFError:
+                    break
+                for k, state in part:
+                    old = merged.get(k)
+                    merged[k] = state if old is None else [
+                        spec[4](a, b) for spec, a, b in zip(self._specs, old, state)]
+            f.close()
+            for k, state in merged.items():
+                yield k, self._finish(state)
+
+    def groups(self, rows, presorted=None):
+        # Rows that are already ordered by key are grouped by groupby() in one pass, with
+        # only the state of the current group in memory, however many keys there are.
+        # By default a sequence is checked for that order, which costs one extra pass over
+        # the keys; pass presorted=True for an iterator known to be sorted (e.g. a sorted
+        # file), or False to always use the hash table.
+        if presorted is None:
+            presorted = isinstance(rows, Sequence) and _is_sorted(rows, self.key)
+        if not presorted:
+            self.update(rows)
+            yield from self.results()
+            return
+        steps = [(i, getter, step) for i, (_, getter, _, step, *_) in enumerate(self._specs)]
+        for k, items in groupby(rows, key=self.key):
+            state = self._start(next(items))
+            for row in items:
+                for i, getter, step in steps:
+                    state[i] = step(state[i], row if getter is None else getter(row))
+            yield k, self._finish(state)
+
+
+def _is_sorted(rows, key):
+    try:
+        return all(map(operator.le, map(key, rows), map(key, islice(rows, 1, None))))
+    except TypeError:
+        # Keys that can't be ordered can't be checked; use the hash table
+        return False
+
+
+# Example use
+by_date = GroupBy(itemgetter('date'), visits=('count',), first=('first', 'address'),
+                  last=('last', 'address'))
+for date, stats in by_date.groups(rows):
+    print(date, stats)
+# 07/01/2012 {'visits': 2, 'first': '5412 N CLARK', 'last': '4801 N BROADWAY'}
+# ...
+
+# Forcing the table to spill to disk after every 2 keys gives the same groups
+by_date = GroupBy(itemgetter('date'), max_keys=2, partitions=3, visits=('count',))
+by_date.update(reversed(rows))
+print(sorted(by_date.results()))
+
+
+# Benchmark against sort + groupby and defaultdict(list) on unsorted rows
+def bench_groupby(n=500000, nkeys=1000):
+    import random
+    import time
+
+    data = [{'key': random.randrange(nkeys), 'value': random.random()} for _ in range(n)]
+
+    def timed(label, func):
+        start = time.perf_counter()
+        func()
+        print(f'{label:22} {time.perf_counter() - start:.3f}s')
+
+    def sort_groupby():
+        ordered = sorted(data, key=itemgetter('key'))
+        return {k: sum(r['value'] for r in items) for k, items in groupby(ordered, key=itemgetter('key'))}
+
+    def multidict():
+        groups = defaultdict(list)
+        for row in data:
+            groups[row['key']].append(row)
+        return {k: sum(r['value'] for r in items) for k, items in groups.items()}
+
+    timed('sort + groupby', sort_groupby)
+    timed('defaultdict(list)', multidict)
+    timed('GroupBy (hash)', lambda: list(GroupBy(itemgetter('key'), total=('sum', 'value')).groups(data)))
+    timed('GroupBy (spill)', lambda: list(GroupBy(itemgetter('key'), max_keys=nkeys // 4,
+                                                  total=('sum', 'value')).groups(data)))
+    data.sort(key=itemgetter('key'))
+    timed('GroupBy (presorted)', lambda: list(GroupBy(itemgetter('key'), total=('sum', 'value')).groups(data)))
+
+
+if __name__ == '__main__':
+    bench_groupby()
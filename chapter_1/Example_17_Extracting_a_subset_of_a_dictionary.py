@@ -39,4 +39,24 @@ print(p1)
 # Make a dictionary of tech stocks
 tech_names = { 'AAPL', 'IBM', 'HPQ', 'MSFT' }
 p2 = {key: prices[key] for key in prices.keys() & tech_names}
-print(p2)
\ No newline at end of file
+print(p2)
+
+
+# Extension
+# When the data is a table of records rather than one dict, the same subsets can be taken
+# a whole column at a time with record_table.RecordTable.
+from record_table import RecordTable
+
+table = RecordTable.from_dicts({'name': key, 'price': value} for key, value in prices.items())
+print({r['name']: r['price'] for r in table.filter('price', '>', 200).to_dicts()})
+# {'AAPL': 612.78, 'IBM': 205.55}
+print({r['name']: r['price'] for r in table.filter('name', 'in', tech_names).to_dicts()})
+# {'AAPL': 612.78, 'IBM': 205.55, 'HPQ': 37.2}
+
+# A subset can also be a view that looks entries up in the original dict when asked,
+# instead of a copy.
+from key_algebra import SubsetView
+
+p3 = SubsetView(prices, tech_names)
+print(p3['IBM'], len(p3))
+# 205.55 3
@@ -20,6 +20,11 @@ Discussion
     Last, but not last, it should be noted that if your goal is to define an efficient data structure where you will
     be changing various instance attributes, using namedtuple is not your best choice. Instead, consider defining a class
     using __slots__instead(Recipe 8.4)
+Extension
+    record_class() generates such a __slots__ class with the namedtuple conveniences
+    (positional construction, unpacking, _replace()). record_batch() goes further and
+    stores many records as one typed array per field, with a reusable cursor for access
+    by name, so no object is created per record.
 """
 
 __author__ = 'Frankie Fu'
@@ -103,4 +108,212 @@ a = {'name': 'ACME', 'shares': 100, 'price': 123.45}
 print(dict_to_stock(a))
 
 b = {'name': 'ACME', 'shares': 100, 'price': 123.45, 'date': '12/17/2012'}
-print(dict_to_stock(b))
\ No newline at end of file
+print(dict_to_stock(b))
+
+
+# Extension: mutable records and record batches
+# A namedtuple can't be changed in place, so every _replace() builds a new tuple. A class
+# with __slots__ is almost as small but has assignable attributes. record_class() writes
+# such a class the way namedtuple() does, generating __init__ source so construction is
+# a plain function call.
+import operator
+from array import array
+from keyword import iskeyword
+
+
+def _check_names(typename, field_names):
+    if isinstance(field_names, str):
+        field_names = field_names.replace(',', ' ').split()
+    for name in [typename] + list(field_names):
+        if not name.isidentifier() or iskeyword(name) or name.startswith('_'):
+            raise ValueError(f'invalid name: {name!r}')
+    return tuple(field_names)
+
+
+def record_class(typename, field_names):
+    fields = _check_names(typename, field_names)
+    args = ', '.join(fields)
+    body = ''.join(f'    self.{name} = {name}\n' for name in fields) or '    pass\n'
+    namespace = {}
+    exec(f'def __init__(self, {args}):\n{body}', namespace)
+
+    def __iter__(self):
+        # Allows unpacking: name, shares, price = rec
+        for name in fields:
+            yield getattr(self, name)
+
+    def __repr__(self):
+        values = ', '.join(f'{name}={getattr(self, name)!r}' for name in fields)
+        return f'{typename}({values})'
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    def _replace(self, **changes):
+        # Same as namedtuple: a new record with some fields changed
+        new = cls.__new__(cls)
+        for name in fields:
+            setattr(new, name, changes.pop(name) if name in changes else getattr(self, name))
+        if changes:
+            raise ValueError(f'got unexpected field names: {list(changes)!r}')
+        return new
+
+    def _update(self, **changes):
+        # Change fields in place, without creating a new record
+        for name, value in changes.items():
+            if name not in fields:
+                raise ValueError(f'got unexpected field name: {name!r}')
+            setattr(self, name, value)
+
+    cls = type(typename, (), {
+        '__slots__': fields, '_fields': fields, '__init__': namespace['__init__'],
+        '__iter__': __iter__, '__repr__': __repr__, '__eq__': __eq__, '__hash__': None,
+        '_replace': _replace, '_update': _update,
+    })
+    return cls
+
+
+MStock = record_class('MStock', ['name', 'shares', 'price'])
+m = MStock('ACME', 100, 123.45)
+m.shares = 75
+print(m)
+# MStock(name='ACME', shares=75, price=123.45)
+name, shares, price = m
+print(m._replace(price=100.0))
+# MStock(name='ACME', shares=75, price=100.0)
+
+
+# For a large number of records even a __slots__ instance (~56 bytes plus its values)
+# adds up. A batch stores each field in an array with a struct-style type code, so a
+# million records are three arrays rather than a million objects. Fields with type code
+# None (strings, other objects) are kept in a list.
+class _Cursor:
+    __slots__ = ('_batch', '_i')
+
+    def __init__(self, batch, i=0):
+        self._batch = batch
+        self._i = i
+
+    def __repr__(self):
+        return f'{self._batch.typename}Cursor({self._batch[self._i]!r})'
+
+
+def record_batch(typename, fields):
+    # fields is a list of (name, typecode) pairs, e.g. [('shares', 'q'), ('price', 'd')]
+    names = _check_names(typename, [name for name, _ in fields])
+    typecodes = dict(fields)
+    record = namedtuple(typename, names)
+
+    class Batch:
+        __slots__ = names
+
+        def __init__(self):
+            for name in names:
+                setattr(self, name, [] if typecodes[name] is None else array(typecodes[name]))
+
+        @classmethod
+        def from_records(cls, records):
+            batch = cls()
+            columns = [getattr(batch, name) for name in names]
+            for rec in records:
+                for column, value in zip(columns, rec):
+                    column.append(value)
+            return batch
+
+        def append(self, *values):
+            for name, value in zip(names, values):
+                getattr(self, name).append(value)
+
+        def __len__(self):
+            return len(getattr(self, names[0]))
+
+        def __getitem__(self, i):
+            # Builds a namedtuple; use rows() to read without creating objects
+            return record(*(getattr(self, name)[i] for name in names))
+
+        def set(self, i, **changes):
+            # The batch equivalent of _replace(): overwrite fields of record i in place
+            for name, value in changes.items():
+                getattr(self, name)[i] = value
+
+        def rows(self):
+            # One cursor object is reused for every record. Its attributes read the
+            # columns at the current position, so they are only valid until the next step.
+            cursor = Cursor(self)
+            for i in range(len(self)):
+                cursor._i = i
+                yield cursor
+
+    # Properties on the cursor class give access by name
+    Cursor = type(typename + 'Cursor', (_Cursor,), {
+        name: property(lambda self, name=name: getattr(self._batch, name)[self._i])
+        for name in names
+    })
+    Batch.__name__ = Batch.__qualname__ = typename + 'Batch'
+    Batch.typename = typename
+    Batch._fields = names
+    return Batch
+
+
+StockBatch = record_batch('Stock', [('name', None), ('shares', 'q'), ('price', 'd')])
+batch = StockBatch.from_records([('ACME', 100, 123.45), ('IBM', 50, 91.1)])
+
+
+# compute_cost() over a batch: no record object is created at all. With NumPy the arrays
+# are viewed in place and multiplied in C; without it, map() still avoids the records.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def compute_batch_cost(batch):
+    if np is not None:
+        # asarray() views an array through the buffer protocol, with the dtype of its typecode
+        return float(np.dot(np.asarray(batch.shares), np.asarray(batch.price)))
+    return sum(map(operator.mul, batch.shares, batch.price))
+
+
+print(compute_batch_cost(batch))
+for rec in batch.rows():
+    print(rec.name, rec.shares * rec.price)
+batch.set(0, shares=75)
+print(batch[0])
+# Stock(name='ACME', shares=75, price=123.45)
+
+
+# Microbenchmarks against the namedtuple version
+def bench_records(n=1000000):
+    import sys
+    import time
+
+    NStock = namedtuple('NStock', ['name', 'shares', 'price'])
+    data = [('ACME', i, 1.5) for i in range(n)]
+
+    def timed(label, func):
+        start = time.perf_counter()
+        result = func()
+        print(f'{label:34} {time.perf_counter() - start:.3f}s')
+        return result
+
+    nts = timed('create namedtuple', lambda: [NStock(*rec) for rec in data])
+    slots = timed('create __slots__ record', lambda: [MStock(*rec) for rec in data])
+    stocks = timed('create batch', lambda: StockBatch.from_records(data))
+    print(f'{"memory per record":34} namedtuple {sys.getsizeof(nts[0])}, '
+          f'__slots__ {sys.getsizeof(slots[0])}, '
+          f'batch {(stocks.shares.itemsize + stocks.price.itemsize + 8)} bytes')
+
+    timed('compute_cost namedtuple', lambda: sum(s.shares * s.price for s in nts))
+    timed('compute_cost __slots__', lambda: sum(s.shares * s.price for s in slots))
+    timed('compute_cost batch', lambda: compute_batch_cost(stocks))
+    timed('compute_cost batch cursor', lambda: sum(r.shares * r.price for r in stocks.rows()))
+
+    timed('namedtuple _replace', lambda: [s._replace(shares=1) for s in nts])
+    timed('__slots__ assignment', lambda: [setattr(s, 'shares', 1) for s in slots])
+    timed('batch set', lambda: [stocks.set(i, shares=1) for i in range(n)])
+
+
+if __name__ == '__main__':
+    bench_records()
@@ -12,6 +12,11 @@ Discussion
         temporary list creating a large temporary data structure to only be used once and discarded.
 
     min() and max() accept a key argument that might be useful.
+Extension
+    Several reductions over the same data are several passes, and a generator can only
+    be consumed once. aggregate() computes any number of them in one traversal of the
+    input, a chunk at a time: NumPy functions on arrays, C builtins on lists. Partial
+    results are merged, so chunks can also be farmed out to worker processes.
 """
 
 __author__ = 'Frankie Fu'
@@ -77,3 +82,185 @@ print('original: ', min_shares)
 min_shares = min(portfolio, key=lambda s: s['shares'])
 print('alternative: ', min_shares)
 
+
+# Extension
+# With the portfolio stored by column in a record_table.RecordTable, a reduction reads one
+# typed array instead of looking up 'shares' in every dict.
+from record_table import RecordTable
+
+table = RecordTable.from_dicts(portfolio)
+print('min_shares: ', table.min('shares'), 'total: ', table.sum('shares'))
+# min_shares:  20 total:  210
+
+
+# aggregate(): many reductions, one traversal
+# Each reduction is given as name=(operation, field), as for GroupBy in Example_15, or as
+# operation=field when the operation name is also a fine result name. field is a dict
+# key, a callable, or None for the item itself. The input is cut into chunks; for each
+# chunk every reduction runs over the (transformed) values with sum(), min(), np.sum()
+# and so on, and the per-chunk results are merged with an associative function. min,
+# max and mean of empty input are None.
+import operator
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+from operator import itemgetter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_REDUCTIONS = {
+    # operation: (chunk function, merge, finish)
+    'count': (len, operator.add, None),
+    'sum': (sum, operator.add, None),
+    'min': (min, min, None),
+    'max': (max, max, None),
+    'any': (any, operator.or_, None),
+    'all': (all, operator.and_, None),
+    'mean': (lambda v: (sum(v), len(v)), lambda a, b: (a[0] + b[0], a[1] + b[1]),
+             lambda s: s[0] / s[1]),
+}
+
+if np is not None:
+    _NUMPY_REDUCTIONS = {
+        'count': len,
+        'sum': lambda v: v.sum().item(),
+        'min': lambda v: v.min().item(),
+        'max': lambda v: v.max().item(),
+        'any': lambda v: bool(v.any()),
+        'all': lambda v: bool(v.all()),
+        'mean': lambda v: (v.sum().item(), len(v)),
+    }
+
+
+def _parse_reductions(reductions):
+    specs = []
+    for name, spec in reductions.items():
+        op, field = spec if isinstance(spec, tuple) else (name, spec)
+        if op not in _REDUCTIONS:
+            raise ValueError(f'unknown reduction {op!r} for {name!r}')
+        getter = field if callable(field) or field is None else itemgetter(field)
+        specs.append((name, op, getter))
+    return specs
+
+
+def _chunk_states(specs, chunk):
+    # Partial result of every reduction over one non-empty chunk. On a NumPy array,
+    # callables get the whole chunk and fields select columns of a structured array.
+    if np is not None and isinstance(chunk, np.ndarray):
+        return [_NUMPY_REDUCTIONS[op](chunk if getter is None else getter(chunk))
+                for _, op, getter in specs]
+    states = []
+    for _, op, getter in specs:
+        if getter is None or op == 'count':
+            values = chunk
+        else:
+            # mean needs the values twice; the other builtins consume the map() directly
+            values = list(map(getter, chunk)) if op == 'mean' else map(getter, chunk)
+        states.append(_REDUCTIONS[op][0](values))
+    return states
+
+
+def _chunks(iterable, size):
+    if isinstance(iterable, (list, tuple)) or (np is not None and isinstance(iterable, np.ndarray)):
+        for start in range(0, len(iterable), size):
+            yield iterable[start:start + size]
+    else:
+        it = iter(iterable)
+        while True:
+            chunk = list(islice(it, size))
+            if not chunk:
+                return
+            yield chunk
+
+
+def _in_processes(func, chunks, processes):
+    # Like pool.map(), but keeps only a few chunks in flight instead of reading the whole
+    # input up front. Results come back in input order.
+    with ProcessPoolExecutor(processes) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(func, chunk))
+            if len(pending) >= 2 * processes:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def aggregate(iterable, chunk_size=65536, processes=None, **reductions):
+    # With processes, fields and transforms must be picklable: field names or
+    # module-level functions, not lambdas.
+    specs = _parse_reductions(reductions)
+    func = partial(_chunk_states, specs)
+    chunks = _chunks(iterable, chunk_size)
+    partials = _in_processes(func, chunks, processes) if processes else map(func, chunks)
+    total = None
+    for states in partials:
+        total = states if total is None else \
+            [_REDUCTIONS[op][1](a, b) for (_, op, _), a, b in zip(specs, total, states)]
+    result = {}
+    for i, (name, op, _) in enumerate(specs):
+        finish = _REDUCTIONS[op][2]
+        if total is None:
+            result[name] = {'count': 0, 'sum': 0, 'any': False, 'all': True}.get(op)
+        else:
+            result[name] = total[i] if finish is None else finish(total[i])
+    return result
+
+
+print(aggregate(nums, sum=lambda x: x * x, count=None, max=None))
+# {'sum': 55, 'count': 5, 'max': 5}
+print(aggregate(portfolio, min='shares', max='shares', total=('sum', 'shares'),
+                big=('any', lambda s: s['shares'] > 70)))
+# {'min': 20, 'max': 75, 'total': 210, 'big': True}
+if np is not None:
+    print(aggregate(np.array(nums), sum=lambda x: x * x, mean=None))
+    # {'sum': 55, 'mean': 3.0}
+
+
+# Benchmark: one pass per reduction against aggregate(), serial and in processes. The
+# input is a generator, as when reading a file, so the separate passes need the whole
+# input in a list first, while aggregate() holds one chunk at a time. Processes only
+# pay off when the transforms do more work per item than pickling it costs.
+def _square(x):
+    return x * x
+
+
+def bench_aggregate(n=2000000, processes=os.cpu_count()):
+    import random
+    import time
+
+    def timed(label, func):
+        start = time.perf_counter()
+        result = func()
+        print(f'{label:34} {time.perf_counter() - start:.3f}s')
+        return result
+
+    random.seed(1)
+    seed = random.getrandbits(32)
+
+    def values():
+        rng = random.Random(seed)
+        return (rng.randint(-1000, 1000) for _ in range(n))
+
+    big = partial(operator.lt, 999)
+
+    def separate_passes():
+        data = list(values())
+        return {'sum': sum(map(_square, data)), 'min': min(data), 'max': max(data),
+                'count': len(data), 'any': any(map(big, data))}
+    expected = timed('list, then separate passes', separate_passes)
+    reductions = dict(sum=_square, min=None, max=None, count=None, any=big)
+    assert timed('aggregate()', lambda: aggregate(values(), **reductions)) == expected
+    assert timed(f'aggregate(processes={processes})',
+                 lambda: aggregate(values(), processes=processes, **reductions)) == expected
+    if np is not None:
+        array = np.fromiter(values(), dtype=np.int64, count=n)
+        assert timed('aggregate(), NumPy array', lambda: aggregate(array, **reductions)) == expected
+
+
+if __name__ == '__main__':
+    bench_aggregate()
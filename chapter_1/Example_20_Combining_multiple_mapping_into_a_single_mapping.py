@@ -11,6 +11,11 @@ Solution
         A ChainMap takes multiple mappings and makes them logically appear as one.
         It simply keeps a list of the underlying mappings and redefines common dictionary operations to scan this list.
 Discussion
+Extension
+    FlatChainMap is a ChainMap that also keeps one flattened dict of the visible values,
+    so lookups, len() and iteration cost the same as on a single dict. The flat dict is
+    kept up to date when the maps are changed through the FlatChainMap or its layer()
+    views. snapshot() returns a read-only copy.
 """
 
 __author__ = 'Frankie Fu'
@@ -54,18 +59,179 @@ del c['x']
 print(a)
 
 
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+# Extension: flattening deep chains
+# Every ChainMap lookup tries each mapping in turn, so a key found in the 10th layer (or
+# a key that is missing) costs 10 dictionary lookups, and len() or keys() builds the union
+# of all layers every time. When lookups are much more frequent than changes, it pays to
+# keep the merged result in a single dict and patch it on every change instead.
+from types import MappingProxyType
+from collections.abc import Mapping, MutableMapping
+
+
+class FlatChainMap(ChainMap):
+    def __init__(self, *maps):
+        super().__init__(*maps)
+        self.refresh()
+
+    def refresh(self):
+        # Rebuild the flat view; needed only if the dicts in self.maps were changed directly.
+        # Keys come out in the same order as ChainMap's; later changes append new keys.
+        flat, owner = {}, {}
+        for i in reversed(range(len(self.maps))):
+            for key, value in self.maps[i].items():
+                flat[key] = value
+                owner[key] = i
+        self._flat = flat
+        self._owner = owner
+
+    def _reindex(self, key):
+        # Find which layer now supplies key after it was removed from an earlier one
+        for i, mapping in enumerate(self.maps):
+            if key in mapping:
+                self._flat[key] = mapping[key]
+                self._owner[key] = i
+                return
+        del self._flat[key], self._owner[key]
+
+    def _layer_set(self, i, key, value):
+        if self._owner.get(key, i) >= i:
+            self._flat[key] = value
+            self._owner[key] = i
+
+    def _layer_del(self, i, key):
+        if self._owner[key] == i:
+            self._reindex(key)
+
+    def __getitem__(self, key):
+        try:
+            return self._flat[key]
+        except KeyError:
+            return self.__missing__(key)
+
+    def get(self, key, default=None):
+        return self._flat.get(key, default)
+
+    def __contains__(self, key):
+        return key in self._flat
+
+    def __len__(self):
+        return len(self._flat)
+
+    def __iter__(self):
+        return iter(self._flat)
+
+    def __setitem__(self, key, value):
+        self.maps[0][key] = value
+        self._layer_set(0, key, value)
+
+    def __delitem__(self, key):
+        try:
+            del self.maps[0][key]
+        except KeyError:
+            raise KeyError(f'Key not found in the first mapping: {key!r}')
+        self._layer_del(0, key)
+
+    def pop(self, key, *args):
+        try:
+            value = self.maps[0].pop(key)
+        except KeyError:
+            if args:
+                return args[0]
+            raise KeyError(f'Key not found in the first mapping: {key!r}')
+        self._layer_del(0, key)
+        return value
+
+    def popitem(self):
+        try:
+            key, value = self.maps[0].popitem()
+        except KeyError:
+            raise KeyError('No keys found in the first mapping.')
+        self._layer_del(0, key)
+        return key, value
+
+    def clear(self):
+        keys = list(self.maps[0])
+        self.maps[0].clear()
+        for key in keys:
+            self._layer_del(0, key)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __or__(self, other):
+        # ChainMap's version updates maps[0] of the copy directly, past the flat dict
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        result = self.copy()
+        result.update(other)
+        return result
+
+    def layer(self, i):
+        # A view of self.maps[i]; changes made through it keep the flat dict in sync
+        return _Layer(self, i)
+
+    def snapshot(self):
+        # Frozen copy of the current merged view; a plain dict lookup underneath
+        return MappingProxyType(dict(self._flat))
+
+
+class _Layer(MutableMapping):
+    def __init__(self, chain, i):
+        self._chain = chain
+        self._i = i
+
+    def __getitem__(self, key):
+        return self._chain.maps[self._i][key]
+
+    def __setitem__(self, key, value):
+        self._chain.maps[self._i][key] = value
+        self._chain._layer_set(self._i, key, value)
+
+    def __delitem__(self, key):
+        del self._chain.maps[self._i][key]
+        self._chain._layer_del(self._i, key)
+
+    def __iter__(self):
+        return iter(self._chain.maps[self._i])
+
+    def __len__(self):
+        return len(self._chain.maps[self._i])
+
+
+# Example use with configuration layers: command line, environment, defaults
+defaults = {'debug': False, 'port': 8000, 'host': 'localhost'}
+environ = {'port': 8080}
+cmdline = {}
+config = FlatChainMap(cmdline, environ, defaults)
+print(config['port'], len(config))
+# 8080 3
+config.layer(1)['host'] = 'example.com'
+del config.layer(1)['port']
+print(config['port'], config['host'])
+# 8000 example.com
+frozen = config.snapshot()
+config['debug'] = True
+print(frozen['debug'], config['debug'])
+# False True
+merged = config | {'workers': 4}
+print(merged['workers'], len(merged), 'workers' in config)
+# 4 4 False
+
+
+# Lookup cost with a dozen layers, each holding different keys
+def bench_chainmap(nlayers=12, nkeys=1000, nlookups=1000000):
+    import timeit
+
+    layers = [{f'{i}.{k}': k for k in range(nkeys)} for i in range(nlayers)]
+    deep_key = f'{nlayers - 1}.1'
+    for label, mapping in [('ChainMap', ChainMap(*layers)), ('FlatChainMap', FlatChainMap(*layers)),
+                           ('snapshot', FlatChainMap(*layers).snapshot())]:
+        hit = timeit.timeit(lambda: mapping[deep_key], number=nlookups)
+        miss = timeit.timeit(lambda: mapping.get('missing'), number=nlookups)
+        size = timeit.timeit(lambda: len(mapping), number=100)
+        print(f'{label:13} deep hit {hit:.3f}s  miss {miss:.3f}s  100 x len() {size:.4f}s')
+
+
+if __name__ == '__main__':
+    bench_chainmap()
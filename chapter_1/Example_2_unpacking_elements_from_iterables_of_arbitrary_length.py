@@ -7,6 +7,9 @@ Problem
     "too many values to unpack" exception.
 Solution
     "start expression"
+Extension
+    TagDispatcher replaces the if/elif chain over tagged records with a dict lookup, and
+    can collect records per tag into batches for handlers that process many at once.
 """
 
 __author__ = 'Frankie Fu'
@@ -86,3 +89,146 @@ def sum2(items2):
 
 
 print(sum2(items))
+
+
+# Extension: dispatching tagged records
+# "for tag, *args in records" builds a new list for every record, and the if/elif chain
+# costs one comparison per branch. A dict from tag to handler is a single lookup no
+# matter how many tags there are. Going further, handlers that can work on many
+# records at once receive them in batches: the records are only appended to a
+# per-tag list (no unpacking or copying) and the handler is called once per batch.
+class TagDispatcher:
+    def __init__(self, batch_size=4096, default=None):
+        self.batch_size = batch_size
+        self.default = default
+        self._handlers = {}
+
+    def register(self, tag, batch=False, columns=False):
+        # Use as a decorator. A plain handler is called as handler(*args) for each
+        # record. A batch handler is called with a list of the original record tuples
+        # (tag included), or, with columns=True, with one tuple per field; that suits
+        # records that all have the same length.
+        def decorate(func):
+            self._handlers[tag] = (func, batch, columns)
+            return func
+        return decorate
+
+    def _unknown(self, record):
+        if self.default is None:
+            raise KeyError(f'no handler for tag {record[0]!r}')
+        self.default(*record)
+
+    def _flush(self, tag, batch):
+        func, _, columns = self._handlers[tag]
+        if columns:
+            # zip() would silently cut every column to the shortest record
+            if len(set(map(len, batch))) > 1:
+                raise ValueError(f'records with tag {tag!r} differ in length; '
+                                 f'columns=True needs them all the same')
+            func(*list(zip(*batch))[1:])
+        else:
+            func(batch)
+
+    def dispatch(self, records):
+        # Records of one tag reach a batch handler in their original order, but batches
+        # of different tags are not interleaved the way the input was.
+        handlers = self._handlers
+        batches = {}
+        size = self.batch_size
+        for record in records:
+            tag = record[0]
+            try:
+                func, batch, _ = handlers[tag]
+            except KeyError:
+                self._unknown(record)
+                continue
+            if not batch:
+                func(*record[1:])
+                continue
+            pending = batches.get(tag)
+            if pending is None:
+                pending = batches[tag] = []
+            pending.append(record)
+            if len(pending) >= size:
+                self._flush(tag, pending)
+                batches[tag] = []
+        for tag, pending in batches.items():
+            if pending:
+                self._flush(tag, pending)
+
+
+# Example use with the records from above
+dispatcher = TagDispatcher()
+dispatcher.register('foo')(do_foo)
+dispatcher.register('bar')(do_bar)
+dispatcher.dispatch(records)
+# foo 1 2
+# bar hello
+# foo 3 4
+
+totals = TagDispatcher()
+
+
+@totals.register('foo', batch=True, columns=True)
+def sum_foo(xs, ys):
+    print('foo batch', sum(xs), sum(ys))
+
+
+totals.register('bar', batch=True)(lambda batch: print('bar batch', len(batch)))
+totals.dispatch(records)
+# foo batch 4 6
+# bar batch 1
+
+
+# Throughput on mixed records: the if/elif loop, per-record dict dispatch, and batches
+def bench_dispatch(n=1000000):
+    import random
+    import time
+
+    kinds = [('foo', 1, 2), ('bar', 'hello'), ('spam', 1.5, 2.5, 3.5), ('grok', 7)]
+    data = [random.choice(kinds) for _ in range(n)]
+    counts = {'foo': 0, 'bar': 0, 'spam': 0, 'grok': 0}
+
+    def on_foo(x, y):
+        counts['foo'] += x
+
+    def on_bar(s):
+        counts['bar'] += 1
+
+    def on_spam(a, b, c):
+        counts['spam'] += 1
+
+    def on_grok(x):
+        counts['grok'] += x
+
+    start = time.perf_counter()
+    for tag, *args in data:
+        if tag == 'foo':
+            on_foo(*args)
+        elif tag == 'bar':
+            on_bar(*args)
+        elif tag == 'spam':
+            on_spam(*args)
+        elif tag == 'grok':
+            on_grok(*args)
+    print(f'if/elif with star unpacking: {time.perf_counter() - start:.3f}s')
+
+    per_record = TagDispatcher()
+    for tag, func in [('foo', on_foo), ('bar', on_bar), ('spam', on_spam), ('grok', on_grok)]:
+        per_record.register(tag)(func)
+    start = time.perf_counter()
+    per_record.dispatch(data)
+    print(f'TagDispatcher per record:    {time.perf_counter() - start:.3f}s')
+
+    batched = TagDispatcher()
+    batched.register('foo', batch=True, columns=True)(lambda xs, ys: sum(xs))
+    batched.register('bar', batch=True)(len)
+    batched.register('spam', batch=True)(len)
+    batched.register('grok', batch=True, columns=True)(sum)
+    start = time.perf_counter()
+    batched.dispatch(data)
+    print(f'TagDispatcher batched:       {time.perf_counter() - start:.3f}s')
+
+
+if __name__ == '__main__':
+    bench_dispatch()
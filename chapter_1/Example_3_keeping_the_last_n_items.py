@@ -14,6 +14,14 @@ Discussion
 
     Adding or poping items from either end of a queue has O(1) complexity. This is
     unlike a list where inserting or removing items from the front of the list is O(N)
+
+    Note that search() yields the same deque object on every match, so its contents
+    change under the consumer. ContextSearcher below returns immutable tuples instead.
+Extension
+    ContextSearcher: mmap + one compiled alternation for many patterns. Line boundaries
+    are only located around hits, never for every line of the file.
+    ring_buffer.MmapRingBuffer: a deque(maxlen=N) kept in a memory mapped file, so the
+    history survives a restart.
 """
 
 __author__ = 'Frankie Fu'
@@ -80,8 +88,183 @@ q.popleft()
 print(q)
 
 
+# Extension: searching large files for many patterns at once
+# search() tests every line in Python and handles a single pattern. For multi-GB logs it
+# is much faster to let the re module scan raw bytes for all patterns in one pass and
+# only look for the surrounding newlines when something matches. Memory mapping the file
+# means the operating system pages it in on demand instead of Python reading it line
+# by line.
+import mmap
+import os
+import re
+import time
+from collections import namedtuple
+
+ContextMatch = namedtuple('ContextMatch', ['pattern', 'line', 'before', 'after'])
+
+
+class ContextSearcher:
+    def __init__(self, patterns, before=5, after=0):
+        patterns = [p.encode('utf-8') if isinstance(p, str) else bytes(p) for p in patterns]
+        # Longest first, so 'Python3' wins over 'Python' at the same offset
+        patterns.sort(key=len, reverse=True)
+        self._regex = re.compile(b'|'.join(map(re.escape, patterns)))
+        self.before = before
+        self.after = after
+
+    def search_file(self, filename):
+        with open(filename, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                pending = deque()
+                yield from self._scan(buf, len(buf), (), pending)
+                yield from self._flush(pending)
+
+    def search_stream(self, chunks):
+        # chunks is any iterable of bytes, e.g. iter(partial(f.read, 1 << 20), b'')
+        pending = deque()
+        tail = ()
+        carry = b''
+        for chunk in chunks:
+            buf = carry + chunk if carry else chunk
+            end = buf.rfind(b'\n') + 1
+            if not end:
+                carry = buf
+                continue
+            yield from self._scan(buf, end, tail, pending)
+            tail = self._before(buf, end, tail)
+            carry = buf[end:]
+        if carry:
+            yield from self._scan(carry, len(carry), tail, pending)
+        yield from self._flush(pending)
+
+    def _scan(self, buf, end, tail, pending):
+        # buf[:end] only holds complete lines; tail is the context carried over from
+        # the previous buffer and pending the hits still waiting for after-lines.
+        after = self.after
+        if pending:
+            lines = self._after(buf, 0, end, after - len(pending[-1][3]))
+            for hit in pending:
+                hit[3].extend(lines[:after - len(hit[3])])
+            while pending and len(pending[0][3]) == after:
+                yield self._emit(pending.popleft())
+
+        search = self._regex.search
+        pos = 0
+        while True:
+            m = search(buf, pos, end)
+            if m is None:
+                break
+            start = buf.rfind(b'\n', 0, m.start()) + 1
+            stop = buf.find(b'\n', m.end(), end)
+            stop = end if stop < 0 else stop + 1
+            hit = [m.group(), buf[start:stop], self._before(buf, start, tail),
+                   self._after(buf, stop, end, after)]
+            if pending or len(hit[3]) < after:
+                pending.append(hit)
+            else:
+                yield self._emit(hit)
+            # Only report each line once, even if several patterns hit it
+            pos = stop
+
+    def _before(self, buf, stop, tail):
+        lines = []
+        while len(lines) < self.before and stop > 0:
+            start = buf.rfind(b'\n', 0, stop - 1) + 1
+            lines.append(buf[start:stop])
+            stop = start
+        lines.reverse()
+        missing = self.before - len(lines)
+        if missing and tail:
+            return tuple(tail[max(0, len(tail) - missing):]) + tuple(lines)
+        return tuple(lines)
+
+    @staticmethod
+    def _after(buf, pos, end, n):
+        lines = []
+        while len(lines) < n and pos < end:
+            stop = buf.find(b'\n', pos, end)
+            stop = end if stop < 0 else stop + 1
+            lines.append(buf[pos:stop])
+            pos = stop
+        return lines
+
+    def _flush(self, pending):
+        # End of input: whatever after-context we have is all there is
+        while pending:
+            yield self._emit(pending.popleft())
+
+    @staticmethod
+    def _emit(hit):
+        return ContextMatch(hit[0], hit[1], hit[2], tuple(hit[3]))
+
+
+# Example use
+if __name__ == '__main__':
+    searcher = ContextSearcher(['Python', 'Java'], before=2, after=1)
+    for match in searcher.search_file('data/somefile.txt'):
+        print(match)
+
+    # The same search over a stream of small chunks gives the same answer
+    with open('data/somefile.txt', 'rb') as f:
+        chunks = iter(lambda: f.read(7), b'')
+        print(list(searcher.search_stream(chunks)) == list(searcher.search_file('data/somefile.txt')))
+    # True
+
+
+# A history that outlives the process
+# deque(maxlen=N) is gone when the program exits. MmapRingBuffer has the same append()
+# and popleft(), but keeps the items in fixed-size slots of a file; opening the file
+# again brings them back. Items are bytes unless encode/decode functions are given.
+from ring_buffer import MmapRingBuffer
+
+if __name__ == '__main__':
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        history = os.path.join(tmp, 'history.ring')
+        with MmapRingBuffer(history, maxlen=3, slot_size=64) as q:
+            for i in range(1, 6):
+                q.append(str(i).encode())
+        with MmapRingBuffer(history, maxlen=3, slot_size=64) as q:
+            print(q)
+            # MmapRingBuffer([b'3', b'4', b'5'], maxlen=3)
+            print(q.popleft(), len(q))
+            # b'3' 2
 
 
+# Throughput compared with the deque loop on a log where hits are rare. The deque version
+# has to test every pattern against every line, while the mmap version hands the whole
+# file to one regex. When most lines match, the line-by-line loop is just as good.
+def bench_search(nlines=500000, patterns=('ERROR', 'FATAL', 'panic')):
+    import tempfile
+    with tempfile.NamedTemporaryFile('w', suffix='.log', delete=False) as f:
+        for i in range(nlines):
+            level = 'ERROR' if i % 1000 == 0 else 'INFO'
+            f.write(f'2024-01-01 12:00:00 {level} worker-{i % 16} handled request {i}\n')
+        filename = f.name
+    size = os.path.getsize(filename) / 2 ** 20
+    try:
+        start = time.perf_counter()
+        with open(filename) as f:
+            hits = 0
+            previous_lines = deque(maxlen=5)
+            for line in f:
+                if any(p in line for p in patterns):
+                    hits += 1
+                    tuple(previous_lines)
+                previous_lines.append(line)
+        deque_time = time.perf_counter() - start
 
+        start = time.perf_counter()
+        mmap_hits = sum(1 for _ in ContextSearcher(patterns, before=5).search_file(filename))
+        mmap_time = time.perf_counter() - start
+    finally:
+        os.remove(filename)
+    print(f'deque loop: {hits} hits, {size / deque_time:.1f} MB/s')
+    print(f'mmap search: {mmap_hits} hits, {size / mmap_time:.1f} MB/s')
 
 
+if __name__ == '__main__':
+    bench_search()
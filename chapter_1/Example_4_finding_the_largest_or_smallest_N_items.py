@@ -16,6 +16,10 @@ Discussion
     ** nlargest() and nsmallest() is adaptive in how it operates and will carry out of some of these
     optimizations on your behalf.
         min, max, sored(item)[:N]
+Extension
+    TopN keeps only N items in a heap while consuming a stream of any length, so memory is
+    O(N) instead of a full list. Accumulators can be merged, and numeric NumPy arrays go
+    through argpartition() first.
 """
 
 __author__ = 'Frankie Fu'
@@ -63,12 +67,184 @@ print(heapq.heappop(heap))
 print(heapq.heappop(heap))
 
 
-
-
-
-
-
-
-
-
-
+# Extension: top-N over a stream
+# nlargest() and nsmallest() need an iterable they can consume in one call. When the data
+# arrives piece by piece (a socket, a large file, several worker processes) you can keep
+# the heap yourself. The heap holds the N best items seen so far with the *worst* of them
+# at heap[0], so each new item only has to be compared with heap[0].
+from itertools import islice
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class _Reversed:
+    # Inverts the ordering of a key so one min-heap implementation serves both directions
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+    def __getstate__(self):
+        return (self.key,)
+
+    def __setstate__(self, state):
+        self.key, = state
+
+
+class TopN:
+    def __init__(self, n, key=None, largest=True):
+        self.n = n
+        self.key = key
+        self.largest = largest
+        # Entries are (key, order, item). order only grows more negative, so among equal
+        # keys the earliest item is kept, which is what nlargest()/nsmallest() do.
+        self._heap = []
+        self._count = 0
+
+    def _entry_key(self, item):
+        k = item if self.key is None else self.key(item)
+        return k if self.largest else _Reversed(k)
+
+    def _offer(self, k, item):
+        heap = self._heap
+        self._count -= 1
+        if len(heap) < self.n:
+            heapq.heappush(heap, (k, self._count, item))
+        elif heap and heap[0] < (k, self._count):
+            heapq.heapreplace(heap, (k, self._count, item))
+
+    def add(self, item):
+        self._offer(self._entry_key(item), item)
+
+    def update(self, items):
+        heap = self._heap
+        it = iter(items)
+        for item in islice(it, max(0, self.n - len(heap))):
+            self.add(item)
+        if not heap:
+            return
+        # Once the heap is full most items are rejected by a single comparison with the
+        # worst key kept so far, without building any tuples.
+        key = self.key
+        order = self._count
+        if self.largest:
+            worst = heap[0][0]
+            for item in it:
+                k = item if key is None else key(item)
+                if worst < k:
+                    order -= 1
+                    heapq.heapreplace(heap, (k, order, item))
+                    worst = heap[0][0]
+        else:
+            worst = heap[0][0].key
+            for item in it:
+                k = item if key is None else key(item)
+                if k < worst:
+                    order -= 1
+                    heapq.heapreplace(heap, (_Reversed(k), order, item))
+                    worst = heap[0][0].key
+        self._count = order
+
+    def add_array(self, values, items=None):
+        # Numeric fast path: argpartition() finds the chunk's N best in O(len) C code,
+        # so only those N values ever touch the Python heap.
+        if np is None or not isinstance(values, np.ndarray) or values.dtype.kind not in 'iuf':
+            self.update(values if items is None else items)
+            return
+        if self.key is not None:
+            raise ValueError('add_array() compares the array values, not key(item)')
+        if self.n <= 0:
+            return
+        index = np.arange(len(values))
+        if len(self._heap) == self.n:
+            # Anything not better than the worst kept value can be dropped up front
+            worst = self._heap[0][0] if self.largest else self._heap[0][0].key
+            index = np.flatnonzero(values > worst if self.largest else values < worst)
+        if len(index) > self.n:
+            candidates = values[index]
+            if self.largest:
+                best = np.argpartition(candidates, len(index) - self.n)[len(index) - self.n:]
+            else:
+                best = np.argpartition(candidates, self.n - 1)[:self.n]
+            # Keep the original order so ties are broken the same way update() would
+            index = np.sort(index[best])
+        for i, v in zip(index.tolist(), values[index].tolist()):
+            self._offer(v if self.largest else _Reversed(v), v if items is None else items[i])
+
+    def merge(self, other):
+        # Combine the result of another accumulator, e.g. one sent back from a worker
+        # process. Only the other heap's N entries need to be offered.
+        for k, _, item in sorted(other._heap, reverse=True):
+            self._offer(k, item)
+        return self
+
+    def result(self):
+        return [item for _, _, item in sorted(self._heap, reverse=True)]
+
+    def __len__(self):
+        return len(self._heap)
+
+
+# Example use
+top = TopN(3, key=lambda s: s['price'])
+top.update(portfolio)
+print(top.result() == heapq.nlargest(3, portfolio, key=lambda s: s['price']))
+# True
+
+# Two shards fed separately give the same answer as one accumulator. Each shard could
+# live in its own process (use a picklable key such as operator.itemgetter('price')).
+from operator import itemgetter
+
+left = TopN(3, key=itemgetter('price'), largest=False)
+right = TopN(3, key=itemgetter('price'), largest=False)
+left.update(portfolio[:3])
+right.update(portfolio[3:])
+print(left.merge(right).result() == cheap)
+# True
+
+
+# Benchmarks. For a small N the heap wins easily; as N grows toward the size of the data
+# every item ends up in the heap and sorting once is faster, just like the Discussion
+# above says for nlargest().
+def bench_topn(total=1000000, chunk=100000):
+    import random
+    import time
+
+    data = [random.random() for _ in range(total)]
+    for label, n in [('small-K', 10), ('large-K', total // 10), ('near-N', total - 10)]:
+        start = time.perf_counter()
+        top = TopN(n)
+        for i in range(0, total, chunk):
+            top.update(data[i:i + chunk])
+        stream_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        heapq.nlargest(n, data)
+        nlargest_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        sorted(data, reverse=True)[:n]
+        sorted_time = time.perf_counter() - start
+        print(f'{label:8} TopN: {stream_time:.3f}s  nlargest: {nlargest_time:.3f}s  '
+              f'sorted: {sorted_time:.3f}s')
+
+        if np is not None:
+            array = np.array(data)
+            start = time.perf_counter()
+            top = TopN(n)
+            for i in range(0, total, chunk):
+                top.add_array(array[i:i + chunk])
+            print(f'{label:8} TopN.add_array: {time.perf_counter() - start:.3f}s')
+
+
+if __name__ == '__main__':
+    bench_topn()
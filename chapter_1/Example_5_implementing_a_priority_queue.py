@@ -16,6 +16,13 @@ Discussion
     number of items in the heap, they are fairly efficient even for fairly large values of N.
 
     (priority, index, item) tuples.
+Extension
+    IndexedPriorityQueue keeps the position of every item in the heap, so a priority can
+    be changed or an item removed in O(logN) without rebuilding the heap.
+    ConcurrentPriorityQueue wraps it with a threading.Condition for producer/consumer use.
+    PriorityQueue.from_iterable() loads many items with a single heapify().
+    ArrayPriorityQueue stores priorities and counters in typed arrays instead of one
+    tuple per entry, at about a fifth of the memory.
 """
 
 __author__ = 'Frankie Fu'
@@ -34,6 +41,16 @@ class PriorityQueue:
     def pop(self):
         return heapq.heappop(self._queue)[-1]
 
+    @classmethod
+    def from_iterable(cls, pairs):
+        # Bulk load of (item, priority) pairs: one heapify() is O(N), where N push() calls
+        # are O(N*logN) and each goes through a Python method call.
+        q = cls()
+        q._queue = [(-priority, index, item) for index, (item, priority) in enumerate(pairs)]
+        heapq.heapify(q._queue)
+        q._index = len(q._queue)
+        return q
+
 
 # Here is an example of how it might be used:
 class Item:
@@ -94,10 +111,340 @@ print(a < c)
 # True
 
 
+# Extension: changing priorities and removing items
+# heapq has no way to find an item in the heap, so changing its priority means searching
+# the list and calling heapify() again. If the queue also remembers where each item is,
+# the item can be moved up or down from its current position instead. The heap below is
+# stored as three parallel lists rather than one tuple per entry; an update only rewrites
+# a number in place and no tuples are created.
+import threading
+
+
+class IndexedPriorityQueue:
+    def __init__(self):
+        self._prio = []         # negated priorities, so the highest priority pops first
+        self._order = []        # insertion counter, keeps FIFO order for equal priorities
+        self._items = []
+        self._pos = {}          # item -> index in the three lists
+        self._index = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, item):
+        return item in self._pos
+
+    def _less(self, i, j):
+        prio = self._prio
+        return prio[i] < prio[j] or (prio[i] == prio[j] and self._order[i] < self._order[j])
+
+    def _swap(self, i, j):
+        prio, order, items = self._prio, self._order, self._items
+        prio[i], prio[j] = prio[j], prio[i]
+        order[i], order[j] = order[j], order[i]
+        items[i], items[j] = items[j], items[i]
+        self._pos[items[i]] = i
+        self._pos[items[j]] = j
+
+    def _sift_up(self, i):
+        while i > 0:
+            parent = (i - 1) >> 1
+            if not self._less(i, parent):
+                break
+            self._swap(i, parent)
+            i = parent
+
+    def _sift_down(self, i):
+        n = len(self._items)
+        while True:
+            child = 2 * i + 1
+            if child >= n:
+                break
+            if child + 1 < n and self._less(child + 1, child):
+                child += 1
+            if not self._less(child, i):
+                break
+            self._swap(i, child)
+            i = child
+
+    def _append(self, item, priority):
+        if item in self._pos:
+            raise ValueError(f'{item!r} is already queued; use update_priority()')
+        key = -priority
+        self._pos[item] = len(self._items)
+        self._prio.append(key)
+        self._order.append(self._index)
+        self._items.append(item)
+        self._index += 1
+
+    def push(self, item, priority):
+        self._append(item, priority)
+        self._sift_up(len(self._items) - 1)
+
+    def pushmany(self, pairs):
+        # Adding k items one at a time costs O(k*logN); appending them all and fixing the
+        # heap bottom-up (what heapify() does) costs O(N+k), which wins for large batches.
+        start, index = len(self._items), self._index
+        try:
+            for item, priority in pairs:
+                self._append(item, priority)
+        except Exception:
+            # A duplicate or unhashable item in the batch: undo the appends, so that the
+            # heap is as before the call
+            for item in self._items[start:]:
+                del self._pos[item]
+            del self._prio[start:], self._order[start:], self._items[start:]
+            self._index = index
+            raise
+        added = len(self._items) - start
+        if added > start:
+            for i in reversed(range(len(self._items) // 2)):
+                self._sift_down(i)
+        else:
+            for i in range(start, len(self._items)):
+                self._sift_up(i)
+
+    def peek(self):
+        if not self._items:
+            raise IndexError('peek from an empty priority queue')
+        return self._items[0]
+
+    def _remove_at(self, i):
+        last = len(self._items) - 1
+        if i != last:
+            self._swap(i, last)
+        self._prio.pop()
+        self._order.pop()
+        item = self._items.pop()
+        del self._pos[item]
+        if i < last:
+            # The entry moved into the hole may belong above or below it
+            self._sift_up(i)
+            self._sift_down(self._pos[self._items[i]])
+        return item
+
+    def pop(self):
+        if not self._items:
+            raise IndexError('pop from an empty priority queue')
+        return self._remove_at(0)
+
+    def popmany(self, n):
+        return [self._remove_at(0) for _ in range(min(n, len(self._items)))]
+
+    def remove(self, item):
+        self._remove_at(self._pos[item])
+
+    def update_priority(self, item, priority):
+        i = self._pos[item]
+        old = self._prio[i]
+        self._prio[i] = -priority
+        if -priority < old:
+            self._sift_up(i)
+        else:
+            self._sift_down(i)
+
+
+# Example use
+q = IndexedPriorityQueue()
+foo, bar, spam, grok = Item('foo'), Item('bar'), Item('spam'), Item('grok')
+q.pushmany([(foo, 1), (bar, 5), (spam, 4), (grok, 1)])
+q.update_priority(grok, 10)
+q.remove(spam)
+print(q.peek())
+# Item(grok)
+print(q.popmany(3))
+# [Item(grok), Item(bar), Item(foo)]
+
+
+# A thread-safe version. Every operation holds the lock only for the O(logN) heap work,
+# and get() waits on a Condition until something is pushed. Its put()/get() are called
+# like those of the heapq queue in chapter_12/example_3_Comunicating_between_threads, and
+# it adds the indexed operations above. Unlike that queue, it uses the items as keys, so
+# they must be hashable and can be queued only once at a time.
+class ConcurrentPriorityQueue:
+    def __init__(self):
+        self._queue = IndexedPriorityQueue()
+        self._cv = threading.Condition()
+
+    def __len__(self):
+        with self._cv:
+            return len(self._queue)
+
+    def put(self, priority, item):
+        with self._cv:
+            self._queue.push(item, priority)
+            self._cv.notify()
+
+    def putmany(self, pairs):
+        with self._cv:
+            self._queue.pushmany((item, priority) for priority, item in pairs)
+            self._cv.notify_all()
+
+    def get(self, timeout=None):
+        with self._cv:
+            if not self._cv.wait_for(lambda: len(self._queue), timeout):
+                raise TimeoutError('no item became available')
+            return self._queue.pop()
+
+    def getmany(self, n, timeout=None):
+        # Waits for at least one item, then returns up to n without releasing the lock
+        with self._cv:
+            if not self._cv.wait_for(lambda: len(self._queue), timeout):
+                raise TimeoutError('no item became available')
+            return self._queue.popmany(n)
+
+    def update_priority(self, item, priority):
+        with self._cv:
+            self._queue.update_priority(item, priority)
+
+    def remove(self, item):
+        with self._cv:
+            self._queue.remove(item)
+
+
+cq = ConcurrentPriorityQueue()
+consumer = threading.Thread(target=lambda: print(cq.getmany(2)))
+consumer.start()
+cq.putmany([(1, 'low'), (5, 'high')])
+consumer.join()
+# ['high', 'low']
+
+
+# Extension: large queues in parallel arrays
+# Every entry of PriorityQueue is a tuple plus a float and an int object, well over 100
+# bytes before the item itself. ArrayPriorityQueue keeps the negated priorities in an
+# array('d') and the insertion counters in an array('q'), 16 bytes per entry, with the
+# items in a plain list. heapq only works on lists, so the sifting is done here. For bulk
+# loading, note that a sorted array is already a valid heap: from_iterable() sorts the
+# priorities (with NumPy if available, else sorted() on the indices) instead of running a
+# heapify() in Python. Both sorts are stable, so equal priorities keep insertion order.
+# The price is push() and pop() in Python, about three times slower than heapq's.
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class ArrayPriorityQueue:
+    def __init__(self):
+        self._prio = array('d')
+        self._order = array('q')
+        self._items = []
+        self._index = 0
+
+    @classmethod
+    def from_iterable(cls, pairs):
+        pairs = pairs if isinstance(pairs, list) else list(pairs)
+        prio = array('d', [-priority for _, priority in pairs])
+        q = cls()
+        if np is not None and prio:
+            index = np.argsort(np.frombuffer(prio, dtype=np.float64), kind='stable')
+            q._prio = array('d', np.frombuffer(prio, dtype=np.float64)[index].tobytes())
+            q._order = array('q', index.astype(np.int64).tobytes())
+            index = index.tolist()
+        else:
+            index = sorted(range(len(prio)), key=prio.__getitem__)
+            q._prio = array('d', map(prio.__getitem__, index))
+            q._order = array('q', index)
+        q._items = [pairs[i][0] for i in index]
+        q._index = len(pairs)
+        return q
+
+    def __len__(self):
+        return len(self._items)
+
+    def push(self, item, priority):
+        prio, order, items = self._prio, self._order, self._items
+        p, o = -priority, self._index
+        self._index += 1
+        prio.append(p)
+        order.append(o)
+        items.append(item)
+        # Move parents down until the new entry's place is found, then write it once
+        i = len(items) - 1
+        while i > 0:
+            parent = (i - 1) >> 1
+            pp = prio[parent]
+            if pp < p or (pp == p and order[parent] < o):
+                break
+            prio[i], order[i], items[i] = pp, order[parent], items[parent]
+            i = parent
+        prio[i], order[i], items[i] = p, o, item
+
+    def pop(self):
+        prio, order, items = self._prio, self._order, self._items
+        if not items:
+            raise IndexError('pop from an empty priority queue')
+        p, o, item = prio.pop(), order.pop(), items.pop()
+        if not items:
+            return item
+        top = items[0]
+        # The last entry goes to the root and sinks below its smaller children
+        n, i = len(items), 0
+        while True:
+            child = 2 * i + 1
+            if child >= n:
+                break
+            right = child + 1
+            if right < n and (prio[right] < prio[child] or
+                              (prio[right] == prio[child] and order[right] < order[child])):
+                child = right
+            pc = prio[child]
+            if p < pc or (p == pc and o < order[child]):
+                break
+            prio[i], order[i], items[i] = pc, order[child], items[child]
+            i = child
+        prio[i], order[i], items[i] = p, o, item
+        return top
+
+
+q = ArrayPriorityQueue.from_iterable([(Item('foo'), 1), (Item('bar'), 5), (Item('spam'), 4)])
+q.push(Item('grok'), 1)
+print([q.pop() for _ in range(len(q))])
+# [Item(bar), Item(spam), Item(foo), Item(grok)]
+
 
+# Load time and memory of the queue structures for n jobs (the jobs themselves are
+# created beforehand and not counted), then the time to pop them all
+def bench_priority_queue_load(n=1000000):
+    import random
+    import time
+    import tracemalloc
 
+    jobs = [f'job-{i}' for i in range(n)]
+    pairs = [(job, random.randrange(100)) for job in jobs]
 
+    def load(label, build):
+        start = time.perf_counter()
+        q = build()
+        elapsed = time.perf_counter() - start
+        del q
+        # Memory in a second run, since tracing slows down allocation
+        tracemalloc.start()
+        q = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f'{label:36} {elapsed:.3f}s  {size / n:.0f} bytes/entry')
+        return q
 
+    def push_loop():
+        q = PriorityQueue()
+        for job, priority in pairs:
+            q.push(job, priority)
+        return q
+    load('PriorityQueue.push() loop', push_loop)
+    q = load('PriorityQueue.from_iterable()', lambda: PriorityQueue.from_iterable(pairs))
+    start = time.perf_counter()
+    expected = [q.pop() for _ in range(n)]
+    print(f'{"  pop all":36} {time.perf_counter() - start:.3f}s')
 
+    q = load('ArrayPriorityQueue.from_iterable()', lambda: ArrayPriorityQueue.from_iterable(pairs))
+    start = time.perf_counter()
+    assert [q.pop() for _ in range(n)] == expected
+    print(f'{"  pop all":36} {time.perf_counter() - start:.3f}s')
 
 
+if __name__ == '__main__':
+    bench_priority_queue_load()
@@ -14,6 +14,11 @@ Discussion
     The size of OrderedDict is more than twice as large as a normal dictionary.
         you would need to study the requirements of your application to determine if the
         benefits of using an OrderedDict outweighed the extra memory overhead.
+Extension
+    Plain dicts keep insertion order too (Python 3.7+). CompactOrderedDict is a dict that
+    adds OrderedDict's move_to_end() and popitem(last=False), so ordered records cost no
+    more than a dict. dump_ordered() writes a large mapping as JSON in batches of items
+    encoded by the C encoder, instead of building one string or encoding token by token.
 """
 
 __author__ = 'Frankie Fu'
@@ -40,3 +45,213 @@ import json
 
 print(json.dumps(d))
 # {"foo": 1, "bar": 2, "spam": 3, "grok": 4}
+
+
+# Extension: ordered records at dict size
+# Storage is a plain dict, which already keeps insertion order, so a record costs what a
+# dict costs. popitem(last=False) cannot just take next(iter(self)) though: deleted
+# entries stay in the dict's table until it is resized and iter() steps over all of
+# them, so an LRU cache evicting from the front gets slower as it runs. On first use the
+# front operations therefore build an index, a deque of keys in order. Keys that were
+# deleted or moved to the end later leave a stale copy in the deque, counted in _stale,
+# which popitem(last=False) skips. Until then every method is the dict's own.
+# Equality is that of dict, which ignores order, not that of OrderedDict.
+from collections import deque
+
+
+class CompactOrderedDict(dict):
+    __slots__ = ('_order', '_stale')
+
+    def __init__(self, *args, **kwargs):
+        self._order = None
+        super().__init__(*args, **kwargs)
+
+    def _track(self):
+        if self._order is None:
+            self._order = deque(self)
+            self._stale = {}
+        return self._order
+
+    def _forget(self, key):
+        # The oldest copy of key in the index no longer marks its position
+        stale = self._stale
+        stale[key] = stale.get(key, 0) + 1
+        if len(self._order) > 2 * len(self) + 16:
+            # Mostly stale copies: start over
+            self._order = deque(self)
+            self._stale = {}
+
+    def __setitem__(self, key, value):
+        if self._order is not None and key not in self:
+            self._order.append(key)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        if self._order is not None:
+            self._forget(key)
+
+    def pop(self, key, *default):
+        if self._order is not None and key in self:
+            value = dict.pop(self, key)
+            self._forget(key)
+            return value
+        return dict.pop(self, key, *default)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        if self._order is None:
+            dict.update(self, *args, **kwargs)
+        else:
+            for key, value in dict(*args, **kwargs).items():
+                self[key] = value
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def clear(self):
+        dict.clear(self)
+        self._order = None
+
+    def move_to_end(self, key, last=True):
+        value = dict.pop(self, key)
+        if last:
+            dict.__setitem__(self, key, value)
+            if self._order is not None:
+                self._order.append(key)
+                self._forget(key)
+        else:
+            # A dict can only append, so moving to the front rewrites it: O(n)
+            rest = dict(self)
+            dict.clear(self)
+            dict.__setitem__(self, key, value)
+            dict.update(self, rest)
+            self._order = None
+
+    def popitem(self, last=True):
+        if last:
+            key, value = dict.popitem(self)
+            if self._order is not None:
+                self._forget(key)
+            return key, value
+        if not self:
+            raise KeyError('dictionary is empty')
+        order, stale = self._track(), self._stale
+        while True:
+            key = order.popleft()
+            count = stale.get(key)
+            if not count:
+                return key, dict.pop(self, key)
+            if count == 1:
+                del stale[key]
+            else:
+                stale[key] = count - 1
+
+    def copy(self):
+        return type(self)(self)
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+    def __repr__(self):
+        return f'{type(self).__name__}({dict.__repr__(self)})'
+
+
+c = CompactOrderedDict(d)
+c.move_to_end('foo')
+print(c.popitem(last=False))
+# ('bar', 2)
+print(json.dumps(c))
+# {"spam": 3, "grok": 4, "foo": 1}
+
+
+# Streaming JSON
+# json.dumps() returns the whole document as one string. json.dump() avoids that, but
+# only uses the C accelerated encoder for one-shot encoding, so it falls back to the
+# pure Python encoder. dump_ordered() takes batch_size items at a time, encodes them
+# as one small dict with the C encoder and writes that without its braces, so memory
+# use is bounded by one batch.
+from itertools import islice
+
+
+def dump_ordered(mapping, fp, batch_size=1000, **kwargs):
+    encoder = json.JSONEncoder(**kwargs)
+    if encoder.indent is not None or encoder.sort_keys:
+        # Indentation and key sorting need the whole structure; leave them to json.dump()
+        json.dump(mapping, fp, **kwargs)
+        return
+    items = iter(mapping.items())
+    separator = ''
+    fp.write('{')
+    while True:
+        batch = dict(islice(items, batch_size))
+        if not batch:
+            break
+        body = encoder.encode(batch)[1:-1]
+        if body:
+            # Empty when skipkeys=True dropped every key of the batch
+            fp.write(separator + body)
+            separator = encoder.item_separator
+    fp.write('}')
+
+
+import io
+
+out = io.StringIO()
+dump_ordered(d, out)
+print(out.getvalue() == json.dumps(d))
+# True
+
+
+# Benchmark: memory of many small ordered records, an LRU eviction loop, and JSON export
+def bench_ordered(n=500000):
+    import tempfile
+    import time
+    import tracemalloc
+
+    fields = ['name', 'shares', 'price', 'date', 'time']
+    for cls in (OrderedDict, CompactOrderedDict, dict):
+        tracemalloc.start()
+        records = [cls(zip(fields, ('ACME', i, 490.1, '6/11/2007', '09:30'))) for i in range(n)]
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del records
+        print(f'{cls.__name__:20} {size / n:.0f} bytes/record')
+
+    for cls in (OrderedDict, CompactOrderedDict):
+        tracemalloc.start()
+        cache = cls((i, str(i)) for i in range(n))
+        cache.popitem(last=False)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        start = time.perf_counter()
+        for i in range(n, 3 * n):
+            cache.move_to_end(i - n // 2)
+            cache.popitem(last=False)
+            cache[i] = i
+        elapsed = time.perf_counter() - start
+        print(f'{cls.__name__:20} LRU of {n}: {size / 2 ** 20:.1f} MB, {2 * n / elapsed / 1e6:.2f} M ops/s')
+
+    data = CompactOrderedDict((f'key{i}', {'shares': i, 'price': i / 3}) for i in range(n))
+    for label, dump in (('json.dumps()', lambda obj, f: f.write(json.dumps(obj))),
+                        ('json.dump()', json.dump), ('dump_ordered()', dump_ordered)):
+        with tempfile.TemporaryFile('w') as f:
+            start = time.perf_counter()
+            dump(data, f)
+            elapsed = time.perf_counter() - start
+            # Peak memory in a second run, since tracing slows the pure Python encoder
+            f.seek(0)
+            tracemalloc.start()
+            dump(data, f)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f'{label:20} {elapsed:.3f}s, peak {peak / 2 ** 20:.1f} MB')
+
+
+if __name__ == '__main__':
+    bench_ordered()
@@ -16,6 +16,10 @@ Discussion
     zip() inverting the dictionary into a sequence of (value, key) pairs.
         when comparisons, the value element is compared first, followed by the key.
         it allows reductions and sorting to be easily performed on the dictionary content using a single statement.
+Extension
+    Every min(zip(...)) or sorted(zip(...)) looks at the whole dictionary again. When the
+    prices change all the time, SortedValueDict keeps the (value, key) pairs sorted as
+    they change: O(logN) per update, O(1) min/max, and range queries by value.
 """
 
 __author__ = 'Frankie Fu'
@@ -80,3 +84,179 @@ print(min(zip(prices.values(), prices.keys())))
 # (45.23, 'AAA')
 print(max(zip(prices.values(), prices.keys())))
 # (45.23, 'ZZZ')
+
+
+# Extension: keeping the dictionary sorted by value
+# A live price map may change thousands of times per second while min(), max() and
+# "everything between 10 and 50" are asked just as often. Instead of re-zipping the dict,
+# keep the same (value, key) tuples in a sorted structure next to it and update both on
+# every assignment. Tuples compare value first and key second, so ties are broken by key
+# exactly as in the recipe above.
+#
+# The sorted structure is a list of sorted sublists of at most ~1000 entries (the layout
+# the third-party sortedcontainers package uses). bisect finds the sublist and the
+# position in it, and insertions only shift one short sublist.
+from bisect import bisect_left, insort
+from collections.abc import MutableMapping
+
+
+class _SortedList:
+    _load = 512
+
+    def __init__(self, iterable=()):
+        values = sorted(iterable)
+        self._lists = [values[i:i + self._load] for i in range(0, len(values), self._load)]
+        self._maxes = [sub[-1] for sub in self._lists]
+
+    def add(self, value):
+        lists, maxes = self._lists, self._maxes
+        if not maxes:
+            lists.append([value])
+            maxes.append(value)
+            return
+        i = bisect_left(maxes, value)
+        if i == len(maxes):
+            i -= 1
+            lists[i].append(value)
+            maxes[i] = value
+        else:
+            insort(lists[i], value)
+        sub = lists[i]
+        if len(sub) > 2 * self._load:
+            half = sub[self._load:]
+            del sub[self._load:]
+            lists.insert(i + 1, half)
+            maxes[i] = sub[-1]
+            maxes.insert(i + 1, half[-1])
+
+    def remove(self, value):
+        lists, maxes = self._lists, self._maxes
+        i = bisect_left(maxes, value)
+        if i < len(maxes):
+            sub = lists[i]
+            j = bisect_left(sub, value)
+            if sub[j] == value:
+                del sub[j]
+                if sub:
+                    maxes[i] = sub[-1]
+                else:
+                    del lists[i], maxes[i]
+                return
+        raise ValueError(f'{value!r} not in list')
+
+    def first(self):
+        return self._lists[0][0]
+
+    def last(self):
+        return self._lists[-1][-1]
+
+    def irange(self, lo, hi):
+        # Entries e with lo <= e[0] <= hi, in order
+        lists = self._lists
+        i = bisect_left(self._maxes, (lo,))
+        j = bisect_left(lists[i], (lo,)) if i < len(lists) else 0
+        for sub in lists[i:]:
+            for entry in sub[j:]:
+                if entry[0] > hi:
+                    return
+                yield entry
+            j = 0
+
+    def __iter__(self):
+        for sub in self._lists:
+            yield from sub
+
+    def __reversed__(self):
+        for sub in reversed(self._lists):
+            yield from reversed(sub)
+
+
+_missing = object()
+
+
+class SortedValueDict(MutableMapping):
+    def __init__(self, *args, **kwargs):
+        self._data = dict(*args, **kwargs)
+        self._index = _SortedList(zip(self._data.values(), self._data.keys()))
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __setitem__(self, key, value):
+        old = self._data.get(key, _missing)
+        if old is not _missing:
+            if old == value:
+                return
+            self._index.remove((old, key))
+        self._data[key] = value
+        self._index.add((value, key))
+
+    def __delitem__(self, key):
+        value = self._data.pop(key)
+        self._index.remove((value, key))
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return f'SortedValueDict({self._data!r})'
+
+    def min(self):
+        # Same answer as min(zip(d.values(), d.keys()))
+        return self._index.first()
+
+    def max(self):
+        return self._index.last()
+
+    def sorted(self, reverse=False):
+        # Same as sorted(zip(d.values(), d.keys())), without sorting anything
+        return list(reversed(self._index) if reverse else self._index)
+
+    def value_range(self, lo, hi):
+        return self._index.irange(lo, hi)
+
+
+# Example use
+prices = SortedValueDict({'ACME': 45.23, 'AAPL': 612.87, 'IBM': 205.55, 'HPQ': 37.20, 'FB': 10.75})
+print(prices.min(), prices.max())
+# (10.75, 'FB') (612.87, 'AAPL')
+prices['FB'] = 700.0
+print(prices.min(), prices.max())
+# (37.2, 'HPQ') (700.0, 'FB')
+print(list(prices.value_range(30, 300)))
+# [(37.2, 'HPQ'), (45.23, 'ACME'), (205.55, 'IBM')]
+prices['ZZZ'] = prices['AAA'] = 1.0
+print(prices.min())
+# (1.0, 'AAA')
+
+
+# A stream of random updates, each followed by a min() query
+def bench_sorted_value_dict(nkeys=100000, nupdates=200000):
+    import random
+    import time
+
+    names = [f'S{i}' for i in range(nkeys)]
+    updates = [(random.choice(names), random.uniform(1, 1000)) for _ in range(nupdates)]
+    live = SortedValueDict((name, random.uniform(1, 1000)) for name in names)
+    start = time.perf_counter()
+    for name, price in updates:
+        live[name] = price
+        live.min()
+    elapsed = time.perf_counter() - start
+    print(f'SortedValueDict: {elapsed / nupdates * 1e6:.2f} us per update + min()')
+
+    plain = dict(live)
+    sample = updates[:200]
+    start = time.perf_counter()
+    for name, price in sample:
+        plain[name] = price
+        min(zip(plain.values(), plain.keys()))
+    elapsed = time.perf_counter() - start
+    print(f'dict + min(zip()): {elapsed / len(sample) * 1e6:.2f} us per update + min()')
+
+
+if __name__ == '__main__':
+    bench_sorted_value_dict()
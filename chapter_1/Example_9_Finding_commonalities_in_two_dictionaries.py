@@ -49,3 +49,16 @@ print(a.items() & b.items())  # {('y', 2)}
 # Make a new dictionary with certain keys removed
 c = {key: a[key] for key in a.keys() - {'z', 'w'}}
 print(c)  # {'x': 1, 'y': 2}
+
+
+# Extension
+# Each of the operations above builds a complete new set or dict. For very large maps the
+# key_algebra module gives lazy versions, plus the full list of differences in one go.
+from key_algebra import common_keys, diff
+
+print(sorted(common_keys(a, b)))  # ['x', 'y']
+for delta in diff(a, b):
+    print(delta)
+# Delta(kind='changed', key='x', old=1, new=11)
+# Delta(kind='removed', key='z', old=3, new=None)
+# Delta(kind='added', key='w', old=None, new=10)
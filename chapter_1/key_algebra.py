@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Key-set algebra for large dictionaries.
+
+Example_9 and Example_17 use a.keys() & b.keys() and dict comprehensions over items().
+Both build a complete new set or dict, which is fine for five keys but not for two maps
+with 50M keys each. The helpers here produce their results lazily:
+    common_keys(), SubsetView      intersections and subsets without copying
+    diff()                         added/removed/changed deltas between two dicts
+    diff_sorted()                  the same for (key, value) streams in key order,
+                                   in one pass with constant memory
+    intersect_arrays(), diff_arrays()
+                                   sorted NumPy key columns, processed in chunks
+"""
+
+__author__ = 'Frankie Fu'
+
+from collections import namedtuple
+from collections.abc import Mapping
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+Delta = namedtuple('Delta', ['kind', 'key', 'old', 'new'])
+
+_MISSING = object()
+
+
+def common_keys(a, b):
+    # Like a.keys() & b.keys(), but a generator: iterate the smaller mapping and look
+    # each key up in the larger one, so no set is built.
+    if len(a) > len(b):
+        a, b = b, a
+    return (key for key in a if key in b)
+
+
+class SubsetView(Mapping):
+    # A read-only view of the entries of mapping whose key is in keys, as in
+    # {key: prices[key] for key in prices.keys() & tech_names}, without copying anything.
+    def __init__(self, mapping, keys):
+        self._mapping = mapping
+        self._keys = keys
+
+    def __getitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        return self._mapping[key]
+
+    def __iter__(self):
+        return common_keys(self._mapping, self._keys) if len(self._keys) < len(self._mapping) \
+            else (key for key in self._mapping if key in self._keys)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f'SubsetView({dict(self)!r})'
+
+
+def diff(old, new):
+    # Deltas that turn old into new. Values are compared with ==.
+    for key, value in old.items():
+        other = new.get(key, _MISSING)
+        if other is _MISSING:
+            yield Delta('removed', key, value, None)
+        elif other != value:
+            yield Delta('changed', key, value, other)
+    for key, value in new.items():
+        if key not in old:
+            yield Delta('added', key, None, value)
+
+
+def diff_sorted(old_items, new_items):
+    # Merge-join of two (key, value) iterables that are both sorted by key, e.g. two
+    # exports read from disk. A single pass, and only the current pair of each is held.
+    old_items, new_items = iter(old_items), iter(new_items)
+    old = next(old_items, None)
+    new = next(new_items, None)
+    while old is not None and new is not None:
+        if old[0] < new[0]:
+            yield Delta('removed', old[0], old[1], None)
+            old = next(old_items, None)
+        elif new[0] < old[0]:
+            yield Delta('added', new[0], None, new[1])
+            new = next(new_items, None)
+        else:
+            if old[1] != new[1]:
+                yield Delta('changed', old[0], old[1], new[1])
+            old = next(old_items, None)
+            new = next(new_items, None)
+    while old is not None:
+        yield Delta('removed', old[0], old[1], None)
+        old = next(old_items, None)
+    while new is not None:
+        yield Delta('added', new[0], None, new[1])
+        new = next(new_items, None)
+
+
+# For keys that are integers (ids, or hashes of string keys) the maps can be stored as
+# two sorted NumPy columns, keys and values. Membership of a whole chunk of keys is then
+# one searchsorted() call, and memory use is bounded by the chunk size.
+def _locate(keys, sorted_keys):
+    # Index of each key in sorted_keys and whether it is really there
+    pos = np.searchsorted(sorted_keys, keys)
+    if not len(sorted_keys):
+        return pos, np.zeros(len(keys), dtype=bool)
+    found = sorted_keys[np.minimum(pos, len(sorted_keys) - 1)] == keys
+    return pos, found & (pos < len(sorted_keys))
+
+
+def intersect_arrays(a_keys, b_keys, chunk=1 << 20):
+    for start in range(0, len(a_keys), chunk):
+        keys = a_keys[start:start + chunk]
+        yield keys[_locate(keys, b_keys)[1]]
+
+
+def diff_arrays(old_keys, old_values, new_keys, new_values, chunk=1 << 20):
+    # Yields (kind, keys) with kind 'removed', 'changed' or 'added', one chunk at a time
+    for start in range(0, len(old_keys), chunk):
+        keys = old_keys[start:start + chunk]
+        pos, found = _locate(keys, new_keys)
+        yield 'removed', keys[~found]
+        changed = old_values[start:start + chunk][found] != new_values[pos[found]]
+        yield 'changed', keys[found][changed]
+    for start in range(0, len(new_keys), chunk):
+        keys = new_keys[start:start + chunk]
+        yield 'added', keys[~_locate(keys, old_keys)[1]]
+
+
+# Benchmark: set operations and a dict comprehension against the lazy versions
+def bench_key_algebra(n=2000000):
+    import random
+    import time
+
+    def timed(label, func):
+        start = time.perf_counter()
+        result = func()
+        print(f'{label:32} {time.perf_counter() - start:.3f}s')
+        return result
+
+    old = {k: k for k in random.sample(range(2 * n), n)}
+    new = dict(old)
+    for k in random.sample(list(old), n // 10):
+        del new[k]
+    for k in random.sample(range(2 * n, 3 * n), n // 10):
+        new[k] = k
+    for k in random.sample(list(new), n // 10):
+        new[k] = -1
+
+    timed('keys() & keys()', lambda: len(old.keys() & new.keys()))
+    timed('common_keys()', lambda: sum(1 for _ in common_keys(old, new)))
+    timed('added/removed/changed via sets', lambda: (
+        new.keys() - old.keys(), old.keys() - new.keys(),
+        {k for k in old.keys() & new.keys() if old[k] != new[k]}))
+    timed('diff()', lambda: sum(1 for _ in diff(old, new)))
+    old_sorted, new_sorted = sorted(old.items()), sorted(new.items())
+    timed('diff_sorted()', lambda: sum(1 for _ in diff_sorted(old_sorted, new_sorted)))
+    if np is not None:
+        old_keys = np.array([k for k, _ in old_sorted])
+        old_values = np.array([v for _, v in old_sorted])
+        new_keys = np.array([k for k, _ in new_sorted])
+        new_values = np.array([v for _, v in new_sorted])
+        timed('intersect_arrays()', lambda: sum(len(c) for c in intersect_arrays(old_keys, new_keys)))
+        timed('diff_arrays()', lambda: sum(len(keys) for _, keys in
+                                           diff_arrays(old_keys, old_values, new_keys, new_values)))
+
+
+if __name__ == '__main__':
+    bench_key_algebra()
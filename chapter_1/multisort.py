@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Sorting records by several keys, some ascending and some descending.
+
+sorted(rows, key=itemgetter('lname', 'fname')) builds a key tuple for every element, and
+mixing ascending and descending keys needs either negated numbers or several sorts. The
+sorter here extracts each key into a column once:
+    multisort()       with NumPy, strings are replaced by their rank and one lexsort()
+                      orders all keys; without it, one stable sort per key, last key
+                      first (an LSD sort), with no tuples built
+    external_sort()   sorts chunks that fit in memory, writes them to temporary files and
+                      merges them with heapq.merge()
+Keys are field names (or attribute names with attrs=True); a leading '-' means
+descending, e.g. multisort(rows, ['lname', '-uid']).
+"""
+
+__author__ = 'Frankie Fu'
+
+import heapq
+import pickle
+import tempfile
+from operator import attrgetter, itemgetter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _parse_keys(keys, attrs):
+    getter = attrgetter if attrs else itemgetter
+    parsed = []
+    for key in keys:
+        descending = key.startswith('-')
+        parsed.append((getter(key[1:] if descending else key), descending))
+    return parsed
+
+
+def _numpy_key(column, descending):
+    if isinstance(column[0], str):
+        # Strings become their rank among the distinct values, so they sort as integers.
+        # Sorting the distinct values is cheap when there are far fewer of them than rows.
+        ranks = {value: rank for rank, value in enumerate(sorted(set(column)))}
+        key = np.fromiter(map(ranks.__getitem__, column), dtype=np.int64, count=len(column))
+    else:
+        key = np.asarray(column)
+        if key.ndim != 1 or key.dtype.kind not in 'iuf':
+            return None
+    return -key if descending else key
+
+
+def argsort(items, keys, attrs=False):
+    items = items if isinstance(items, list) else list(items)
+    columns = [(list(map(getter, items)), descending) for getter, descending in _parse_keys(keys, attrs)]
+    if np is not None and items:
+        numeric = [_numpy_key(column, descending) for column, descending in columns]
+        if all(key is not None for key in numeric):
+            # lexsort() is stable and takes the primary key last
+            return np.lexsort(numeric[::-1]).tolist()
+    order = list(range(len(items)))
+    for column, descending in reversed(columns):
+        # sorted() is stable, also with reverse=True, so each pass keeps the order that
+        # the later keys established for equal values of this key
+        order.sort(key=column.__getitem__, reverse=descending)
+    return order
+
+
+def multisort(items, keys, attrs=False):
+    items = items if isinstance(items, list) else list(items)
+    return [items[i] for i in argsort(items, keys, attrs)]
+
+
+class _Descending:
+    # Reverses the ordering of any value, for merging descending string keys
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+def _merge_key(keys, attrs):
+    parsed = _parse_keys(keys, attrs)
+
+    def key(item):
+        return tuple(_Descending(getter(item)) if descending else getter(item)
+                     for getter, descending in parsed)
+    return key
+
+
+def external_sort(items, keys, attrs=False, chunk_size=100000):
+    # Items must be picklable. Each run is sorted with multisort() and stored in its own
+    # temporary file; only one item per run is in memory during the merge.
+    runs = []
+    chunk = []
+    try:
+        for item in items:
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                runs.append(_write_run(multisort(chunk, keys, attrs)))
+                chunk = []
+        if not runs:
+            yield from multisort(chunk, keys, attrs)
+            return
+        if chunk:
+            runs.append(_write_run(multisort(chunk, keys, attrs)))
+        yield from heapq.merge(*map(_read_run, runs), key=_merge_key(keys, attrs))
+    finally:
+        for f in runs:
+            f.close()
+
+
+def _write_run(items):
+    f = tempfile.TemporaryFile()
+    # Pickle in blocks: one pickle per item would make the file needlessly slow to read
+    for i in range(0, len(items), 1000):
+        pickle.dump(items[i:i + 1000], f, pickle.HIGHEST_PROTOCOL)
+    return f
+
+
+def _read_run(f):
+    f.seek(0)
+    while True:
+        try:
+            yield from pickle.load(f)
+        except EOFError:
+            return
+
+
+# Benchmark against sorted() with itemgetter, and two passes for a descending key
+def bench_multisort(n=1000000):
+    import random
+    import time
+
+    names = [f'name{i}' for i in range(5000)]
+    rows = [{'lname': random.choice(names), 'fname': random.choice(names), 'uid': i}
+            for i in range(n)]
+    random.shuffle(rows)
+
+    def timed(label, func):
+        start = time.perf_counter()
+        result = func()
+        print(f'{label:36} {time.perf_counter() - start:.3f}s')
+        return result
+
+    expected = timed('sorted(itemgetter(lname, fname))',
+                     lambda: sorted(rows, key=itemgetter('lname', 'fname')))
+    result = timed('multisort([lname, fname])', lambda: multisort(rows, ['lname', 'fname']))
+    assert result == expected
+
+    def two_pass():
+        ordered = sorted(rows, key=itemgetter('uid'), reverse=True)
+        return sorted(ordered, key=itemgetter('lname'))
+    expected = timed('sorted() twice for lname, -uid', two_pass)
+    result = timed('multisort([lname, -uid])', lambda: multisort(rows, ['lname', '-uid']))
+    assert result == expected
+
+    result = timed('external_sort([lname, -uid])',
+                   lambda: list(external_sort(rows, ['lname', '-uid'], chunk_size=n // 4)))
+    assert result == expected
+
+
+if __name__ == '__main__':
+    bench_multisort()
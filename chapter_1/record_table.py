@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+A column-oriented alternative to a list of dictionaries.
+
+The recipes in this chapter keep records such as 'rows' and 'portfolio' as a list of
+dicts. Every row then carries its own hash table (200+ bytes) and every field access is
+a dictionary lookup. RecordTable stores each field as one typed 'array' instead:
+    int    -> array('q')
+    float  -> array('d')
+    str    -> array('i') of codes into a table of interned strings
+    other  -> list
+Sorting, filtering and reductions work on whole columns, and use NumPy views of the
+arrays when NumPy is installed. to_dicts() turns records back into dicts on demand.
+"""
+
+__author__ = 'Frankie Fu'
+
+import operator
+import sys
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_OPERATORS = {
+    '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+    '==': operator.eq, '!=': operator.ne,
+}
+
+
+class StringColumn:
+    # Dictionary encoding: each distinct string is stored once and rows hold its code
+    def __init__(self, values=()):
+        self.codes = array('i')
+        self.strings = []
+        self._index = {}
+        for value in values:
+            self.append(value)
+
+    def append(self, value):
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.strings)
+            self.strings.append(sys.intern(value))
+        self.codes.append(code)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        return self.strings[self.codes[i]]
+
+    def __iter__(self):
+        return map(self.strings.__getitem__, self.codes)
+
+    def ranks(self):
+        # Sort position of every distinct string, so codes can be sorted as integers
+        ranks = array('i', bytes(4 * len(self.strings)))
+        for rank, code in enumerate(sorted(range(len(self.strings)), key=self.strings.__getitem__)):
+            ranks[code] = rank
+        return ranks
+
+    def take(self, indices):
+        column = StringColumn()
+        column.strings = self.strings
+        column._index = self._index
+        if np is not None and isinstance(indices, np.ndarray):
+            column.codes = array('i', _as_numpy(self.codes)[indices].tobytes())
+        else:
+            column.codes = array('i', map(self.codes.__getitem__, indices))
+        return column
+
+
+def _new_column(value):
+    if isinstance(value, bool):
+        return []
+    if isinstance(value, int):
+        return array('q')
+    if isinstance(value, float):
+        return array('d')
+    if isinstance(value, str):
+        return StringColumn()
+    return []
+
+
+def _widened(column, value):
+    # The column itself if value fits in it, else a copy that can hold value as well:
+    # an int column meeting a float becomes a float column, as Python arithmetic would
+    # widen it, and any other mismatch falls back to a list
+    if isinstance(column, list):
+        return column
+    if isinstance(column, StringColumn):
+        if isinstance(value, str):
+            return column
+    elif isinstance(value, bool):
+        pass
+    elif column.typecode == 'q':
+        if isinstance(value, int) and -2 ** 63 <= value < 2 ** 63:
+            return column
+        if isinstance(value, float):
+            return array('d', column)
+    elif isinstance(value, float) or isinstance(value, int) and abs(value) <= sys.float_info.max:
+        return column
+    return list(column)
+
+
+def _as_numpy(column):
+    if np is None:
+        return None
+    if isinstance(column, StringColumn):
+        column = column.codes
+    if isinstance(column, array):
+        if not column:
+            return np.empty(0, dtype=np.dtype(column.typecode))
+        return np.frombuffer(column, dtype=np.dtype(column.typecode))
+    return None
+
+
+class RecordTable:
+    def __init__(self, fields=()):
+        self.fields = list(fields)
+        self._columns = {}
+        self._length = 0
+
+    @classmethod
+    def from_dicts(cls, rows):
+        table = cls()
+        table.extend(rows)
+        return table
+
+    def append(self, row):
+        columns = self._columns
+        if not columns:
+            columns = {name: _new_column(row[name]) for name in self.fields or list(row)}
+        # Every value is looked up and checked before any column changes, so a row that
+        # fails leaves all columns the same length
+        values = [row[name] for name in columns]
+        widened = [_widened(column, value) for column, value in zip(columns.values(), values)]
+        for name, column, value in zip(columns, widened, values):
+            column.append(value)
+            columns[name] = column
+        if columns is not self._columns:
+            self._columns, self.fields = columns, list(columns)
+        self._length += 1
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def __len__(self):
+        return self._length
+
+    def column(self, name):
+        return self._columns[name]
+
+    def __getitem__(self, i):
+        return {name: column[i] for name, column in self._columns.items()}
+
+    def to_dicts(self, *fields):
+        # A lazy view; pass field names to get the subset of each record as in Example_17
+        columns = [(name, self._columns[name]) for name in fields or self.fields]
+        for i in range(self._length):
+            yield {name: column[i] for name, column in columns}
+
+    def take(self, indices):
+        # New table holding the given rows in the given order
+        if np is not None and not isinstance(indices, list):
+            indices = np.asarray(indices, dtype=np.intp)
+        table = RecordTable(self.fields)
+        for name, column in self._columns.items():
+            view = None if isinstance(indices, list) else _as_numpy(column)
+            if isinstance(column, StringColumn):
+                taken = column.take(indices)
+            elif view is not None:
+                taken = array(column.typecode, view[indices].tobytes())
+            elif isinstance(column, array):
+                taken = array(column.typecode, map(column.__getitem__, indices))
+            else:
+                taken = [column[i] for i in (indices if isinstance(indices, list) else indices.tolist())]
+            table._columns[name] = taken
+        table._length = len(indices)
+        return table
+
+    def _sort_key(self, name):
+        column = self._columns[name]
+        if isinstance(column, StringColumn):
+            ranks = column.ranks()
+            if np is not None:
+                return _as_numpy(ranks)[_as_numpy(column)]
+            return array('i', map(ranks.__getitem__, column.codes))
+        return _as_numpy(column) if np is not None else column
+
+    def argsort(self, *names, reverse=False):
+        keys = [self._sort_key(name) for name in names]
+        if np is not None and all(isinstance(k, np.ndarray) for k in keys):
+            if reverse:
+                keys = [-k for k in keys]
+            # lexsort() takes the primary key last, and is stable like sorted()
+            return np.lexsort(keys[::-1])
+        if len(keys) == 1:
+            return sorted(range(self._length), key=keys[0].__getitem__, reverse=reverse)
+        return sorted(range(self._length), key=list(zip(*keys)).__getitem__, reverse=reverse)
+
+    def sort(self, *names, reverse=False):
+        return self.take(self.argsort(*names, reverse=reverse))
+
+    def mask(self, name, op, value):
+        column = self._columns[name]
+        if isinstance(column, StringColumn):
+            if op == 'in':
+                wanted = {column._index[v] for v in value if v in column._index}
+                if np is not None:
+                    return np.isin(_as_numpy(column), np.fromiter(wanted, dtype=np.int32, count=len(wanted)))
+                return [code in wanted for code in column.codes]
+            column = list(column)
+        elif op == 'in':
+            value = set(value)
+            return [v in value for v in column]
+        view = _as_numpy(column)
+        if view is not None:
+            return _OPERATORS[op](view, value)
+        compare = _OPERATORS[op]
+        return [compare(v, value) for v in column]
+
+    def filter(self, name, op, value):
+        # e.g. table.filter('price', '>', 200) or table.filter('name', 'in', tech_names)
+        selected = self.mask(name, op, value)
+        if np is not None and isinstance(selected, np.ndarray):
+            return self.take(np.flatnonzero(selected))
+        return self.take([i for i, keep in enumerate(selected) if keep])
+
+    def _reduce(self, name, numpy_func, func):
+        column = self._columns[name]
+        if isinstance(column, StringColumn):
+            return func(column)
+        view = _as_numpy(column)
+        if view is not None and len(view):
+            return numpy_func(view).item()
+        return func(column)
+
+    def sum(self, name):
+        return self._reduce(name, np.sum if np is not None else None, sum)
+
+    def min(self, name):
+        return self._reduce(name, np.min if np is not None else None, min)
+
+    def max(self, name):
+        return self._reduce(name, np.max if np is not None else None, max)
+
+    def nbytes(self):
+        # Approximate size of the column storage, not counting shared interned strings
+        size = 0
+        for column in self._columns.values():
+            if isinstance(column, StringColumn):
+                column = column.codes
+            size += sys.getsizeof(column)
+        return size
+
+
+# Benchmark against a list of dicts, using the operations from Example_13, 17 and 19
+def bench_record_table(n=1000000):
+    import random
+    import time
+    import tracemalloc
+
+    names = ['ACME', 'AAPL', 'IBM', 'HPQ', 'FB', 'MSFT', 'YHOO', 'SCOX']
+    tracemalloc.start()
+    rows = [{'name': random.choice(names), 'shares': random.randrange(1, 1000),
+             'price': random.uniform(1, 700)} for _ in range(n)]
+    rows_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    table = RecordTable.from_dicts(rows)
+    print(f'memory: dicts {rows_memory / n:.0f} bytes/row, table {table.nbytes() / n:.1f} bytes/row')
+
+    def compare(label, on_rows, on_table):
+        start = time.perf_counter()
+        on_rows()
+        rows_time = time.perf_counter() - start
+        start = time.perf_counter()
+        on_table()
+        table_time = time.perf_counter() - start
+        print(f'{label:18} dicts {rows_time:.3f}s  table {table_time:.3f}s  ({rows_time / table_time:.0f}x)')
+
+    compare('sort name, price', lambda: sorted(rows, key=operator.itemgetter('name', 'price')),
+            lambda: table.argsort('name', 'price'))
+    compare('filter price > 200', lambda: [r for r in rows if r['price'] > 200],
+            lambda: table.filter('price', '>', 200))
+    compare('filter name in', lambda: [r for r in rows if r['name'] in {'AAPL', 'IBM'}],
+            lambda: table.filter('name', 'in', {'AAPL', 'IBM'}))
+    compare('min shares', lambda: min(r['shares'] for r in rows), lambda: table.min('shares'))
+    compare('sum price', lambda: sum(r['price'] for r in rows), lambda: table.sum('price'))
+
+
+if __name__ == '__main__':
+    bench_record_table()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+A deque(maxlen=N) that lives in a file.
+
+Example_3 keeps the last N lines in a deque, and chapter_4's linehistory does the same;
+both lose the history when the process exits. MmapRingBuffer keeps it in a memory
+mapped file of maxlen fixed-size slots instead:
+    append() / popleft()   O(1), the oldest item is dropped when the buffer is full
+    views()                memoryviews straight into the mapping, no copies
+    reopening the file     gives back the same items, also after a crash
+Items are bytes by default; pass encode/decode (e.g. pickle.dumps/pickle.loads) to
+store other objects.
+
+File layout: a 64 byte header, then the slots. Each slot is a 4 byte length followed
+by the data.
+    0   8s  magic
+    8   I   slot size
+    16  Q   maxlen
+    24  Q   start, sequence number of the oldest item
+    32  Q   end, sequence number of the next item to append
+Item number seq is in slot seq % maxlen. A slot is written completely before end is
+advanced past it, and start is advanced before a slot is reused, each with a single
+8 byte store. A crash at any point therefore leaves a valid buffer that at most lacks
+the item being appended (or the oldest one, when it was about to be overwritten).
+"""
+
+__author__ = 'Frankie Fu'
+
+import mmap
+import os
+import struct
+
+_MAGIC = b'RINGBUF1'
+_HEADER = struct.Struct('<8sI4xQQQ')
+_HEADER_SIZE = 64
+_COUNTER = struct.Struct('<Q')
+_START, _END = 24, 32
+_LENGTH = struct.Struct('<I')
+
+
+class MmapRingBuffer:
+    def __init__(self, filename, maxlen, slot_size=256, encode=None, decode=bytes, sync=False):
+        # sync=True calls msync() on every change, so that the buffer also survives a power
+        # failure, not just a crash of the process. It is much slower.
+        if maxlen < 1 or slot_size <= _LENGTH.size:
+            raise ValueError('maxlen must be at least 1 and slot_size more than 4')
+        self.maxlen = maxlen
+        self.slot_size = slot_size
+        self._encode = encode
+        self._decode = decode
+        self._sync = sync
+        size = _HEADER_SIZE + maxlen * slot_size
+        fd = os.open(filename, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            existing = os.fstat(fd).st_size
+            if existing == 0:
+                os.ftruncate(fd, size)
+            elif existing != size:
+                raise ValueError(f'{filename} holds a buffer of a different size')
+            self._mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        magic, stored_slot_size, stored_maxlen, _, _ = _HEADER.unpack_from(self._mm)
+        if magic == _MAGIC:
+            if (stored_slot_size, stored_maxlen) != (slot_size, maxlen):
+                self._mm.close()
+                raise ValueError(f'{filename} holds a buffer with maxlen={stored_maxlen}, '
+                                 f'slot_size={stored_slot_size}')
+        elif magic == bytes(8):
+            _HEADER.pack_into(self._mm, 0, _MAGIC, slot_size, maxlen, 0, 0)
+            self._flush(0, _HEADER_SIZE)
+        else:
+            self._mm.close()
+            raise ValueError(f'{filename} is not a ring buffer file')
+        self._view = memoryview(self._mm)
+        # One writer per file is assumed, so the counters are read once and then kept here
+        self._start = _COUNTER.unpack_from(self._mm, _START)[0]
+        self._end = _COUNTER.unpack_from(self._mm, _END)[0]
+
+    def _flush(self, offset, size):
+        if self._sync:
+            # msync() needs a page aligned offset
+            aligned = offset - offset % mmap.PAGESIZE
+            self._mm.flush(aligned, offset + size - aligned)
+
+    def __len__(self):
+        return self._end - self._start
+
+    def _slot(self, seq):
+        # Offset of the data of item seq, and its length
+        offset = _HEADER_SIZE + seq % self.maxlen * self.slot_size
+        return offset + _LENGTH.size, _LENGTH.unpack_from(self._mm, offset)[0]
+
+    def append(self, item):
+        data = item if self._encode is None else self._encode(item)
+        if len(data) > self.slot_size - _LENGTH.size:
+            raise ValueError(f'item of {len(data)} bytes does not fit in a {self.slot_size} byte slot')
+        mm, end = self._mm, self._end
+        if end - self._start == self.maxlen:
+            # Drop the oldest item first; its slot is the one about to be reused
+            self._start += 1
+            _COUNTER.pack_into(mm, _START, self._start)
+            self._flush(_START, 8)
+        offset = _HEADER_SIZE + end % self.maxlen * self.slot_size
+        _LENGTH.pack_into(mm, offset, len(data))
+        mm[offset + _LENGTH.size:offset + _LENGTH.size + len(data)] = data
+        self._flush(offset, self.slot_size)
+        self._end = end + 1
+        _COUNTER.pack_into(mm, _END, end + 1)
+        self._flush(_END, 8)
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
+
+    def popleft(self):
+        if self._start == self._end:
+            raise IndexError('pop from an empty deque')
+        offset, length = self._slot(self._start)
+        item = self._decode(self._view[offset:offset + length])
+        self._start += 1
+        _COUNTER.pack_into(self._mm, _START, self._start)
+        self._flush(_START, 8)
+        return item
+
+    def clear(self):
+        self._start = self._end
+        _COUNTER.pack_into(self._mm, _START, self._start)
+        self._flush(_START, 8)
+
+    def views(self, n=None):
+        # The last n items (all by default), oldest first, as memoryviews into the file.
+        # They are only valid until their slot is reused by later appends.
+        start, end = self._start, self._end
+        if n is not None:
+            start = max(start, end - n)
+        view = self._view
+        for seq in range(start, end):
+            offset, length = self._slot(seq)
+            yield view[offset:offset + length]
+
+    def __iter__(self):
+        return map(self._decode, self.views())
+
+    def __getitem__(self, index):
+        start, end = self._start, self._end
+        if index < 0:
+            index += end - start
+        if not 0 <= index < end - start:
+            raise IndexError('deque index out of range')
+        offset, length = self._slot(start + index)
+        return self._decode(self._view[offset:offset + length])
+
+    def __repr__(self):
+        return f'MmapRingBuffer({list(self)!r}, maxlen={self.maxlen})'
+
+    def flush(self):
+        self._mm.flush()
+
+    def close(self):
+        # Views handed out by views() must be released before the file can be closed
+        if not self._mm.closed:
+            self._view.release()
+            self._mm.flush()
+            self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Benchmark: appends per second against deque(maxlen=N), and reopening a full buffer
+def bench_ring_buffer(n=1000000, maxlen=100000):
+    import tempfile
+    import time
+    from collections import deque
+
+    items = [f'2024-01-01 12:00:00 INFO handled request {i}'.encode() for i in range(n)]
+    start = time.perf_counter()
+    q = deque(maxlen=maxlen)
+    for item in items:
+        q.append(item)
+    print(f'deque         {n / (time.perf_counter() - start) / 1e6:.2f} M appends/s')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, 'history.ring')
+        start = time.perf_counter()
+        with MmapRingBuffer(filename, maxlen, slot_size=64) as ring:
+            ring.extend(items)
+        print(f'ring buffer   {n / (time.perf_counter() - start) / 1e6:.2f} M appends/s')
+
+        start = time.perf_counter()
+        with MmapRingBuffer(filename, maxlen, slot_size=64) as ring:
+            last = [bytes(v) for v in ring.views(10)]
+        print(f'reopen and read the last 10 items: {(time.perf_counter() - start) * 1e3:.2f} ms')
+        assert last == items[-10:]
+        assert list(q)[-10:] == last
+
+
+if __name__ == '__main__':
+    bench_ring_buffer()
@@ -2,6 +2,9 @@ import heapq
 import threading
 
 
+# If priorities need to change or queued items need to be cancelled, see
+# ConcurrentPriorityQueue in chapter_1/Example_5_implementing_a_priority_queue.py. Its
+# put()/get() take the same arguments, but the items must be hashable and distinct.
 class PriorityQueue:
     def __init__(self):
         self._queue = []
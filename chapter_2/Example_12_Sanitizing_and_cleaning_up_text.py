@@ -9,6 +9,9 @@ Problem
 Solution
     str.translate() method.
 Discussion
+Extension
+    sanitizer.sanitize() builds cmb_chrs and digitmap once, keeps them in a cache file for
+    later processes, and strips and folds in one translate() with a faster table.
 """
 
 __author__ = 'Frankie Fu'
@@ -114,3 +117,17 @@ def clean_spaces(s):
 
 # Although the focus of this recipe has been text, similar technique can be applied to bytes, including
 # simple replacements, translation, and regular expressions.
+
+
+# Extension: building the tables once
+# The two tables above take a call to unicodedata for each of the 1.1M code points, every
+# time the program runs. The sanitizer module builds them on first use and saves them in
+# a cache file named after unicodedata.unidata_version, so later processes only read a
+# few kilobytes. sanitize() then does the NFD and both translations in one go, and
+# returns ASCII text untouched. Run sanitizer.py for startup and throughput figures.
+import sanitizer
+
+print(sanitizer.combining_chars() == cmb_chrs, sanitizer.digit_map() == digitmap)
+# True True
+print(sanitizer.sanitize('pýtĥöñ\fis\tawesome \u0661\u0662\u0663'.translate(remap)))
+# python is awesome 123
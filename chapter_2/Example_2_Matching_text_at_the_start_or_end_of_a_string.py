@@ -13,6 +13,10 @@ Discussion
     data reduction:
         if any(name.endswith(('.c', '.h')) for name in listdir(dirname)):
             ...
+Extension
+    With thousands of choices, startswith(tuple) compares against each of them.
+    literal_matcher.PrefixTrie and SuffixTrie look a string up in time proportional to
+    its own length instead.
 """
 
 __author__ = 'Frankie Fu'
@@ -79,38 +83,25 @@ print(re.match('http:|https:|fpt:', url))
 # Last, but not least, the "startswith()" and "endswith()" methods look nice when combined with other
 # operations, such as common data reductions. For example, this statement that checks a directory for
 # the presence of certain kinds of files:
-if any(name.endswith(('.c', '.h')) for name in os.listdir("dirname")):
+dirname = '.'
+if any(name.endswith(('.c', '.h')) for name in os.listdir(dirname)):
     ...
 
 
+# Extension
+# startswith() and endswith() with a tuple try the choices one by one, which is fine for
+# three URI schemes but not for classifying URLs against 50,000 known hosts. A trie is
+# built once from the choices; a lookup then walks the string a character at a time and
+# never looks at choices that do not share its first characters. match_prefix() returns
+# the longest matching choice, or None.
+from literal_matcher import PrefixTrie, SuffixTrie
 
+schemes = PrefixTrie(['http:', 'https:', 'ftp:'])
+print(schemes.match_prefix('https://www.python.org'))
+# https:
+print(schemes.match_prefix_many(['ftp://ftp.python.org', 'file:///tmp/spam.txt']))
+# ['ftp:', None]
 
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+sources = SuffixTrie(['.c', '.h', '.cpp'])
+print([name for name, ext in zip(filenames, sources.match_suffix_many(filenames)) if ext])
+# []
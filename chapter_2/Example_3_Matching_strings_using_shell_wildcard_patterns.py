@@ -15,6 +15,10 @@ Discussion
     If you're just to trying to provide a simple mechanism for allowing wildcards in data processing operations,
     it's often reasonable solution.
     If you're actually trying to write code that matches filenames, use the "glob" module instead. See Recipe 5.13.
+Extension
+    GlobSet compiles many patterns together. Plain names, '*.ext' suffixes and 'prefix*'
+    patterns become dict lookups keyed by the literal part; the rest share one regex.
+    filter() runs each of these over the whole list with C-level map()/compress().
 """
 
 __author__ = 'Frankie Fu'
@@ -66,9 +70,152 @@ print([addr for addr in addresses if fnmatchcase(addr, '54[0-9][0-9] *CLARK*')])
 # If you're actually trying to write code that matches filenames, use the glob module instead. See Recipe 5.13.
 
 
-
-
-
-
-
-
+# Extension: matching millions of names against many patterns
+# [name for name in names if any(fnmatch(name, p) for p in patterns)] costs one
+# fnmatch() call, with its pattern cache lookup, per name and pattern. Most patterns in
+# include/exclude rules are of three simple kinds, which need no regex at all:
+#     'Makefile'      the whole name: a set lookup
+#     '*.csv'         a literal suffix: look up name[-4:] among the suffixes of length 4
+#     'Data*'         a literal prefix: look up name[:4] among the prefixes of length 4
+# so a name costs one lookup per distinct suffix or prefix length, however many patterns
+# there are. Everything else is translated with fnmatch.translate() and combined into
+# one alternation. case_sensitive=False lowercases patterns and names, like fnmatch()
+# does on Windows.
+import re
+from collections import defaultdict
+from fnmatch import translate
+from itertools import compress, filterfalse
+from operator import itemgetter, not_
+
+
+class GlobSet:
+    def __init__(self, patterns, case_sensitive=True):
+        self.patterns = list(patterns)
+        self.case_sensitive = case_sensitive
+        self._match_all = []                    # indices of patterns that are all '*'
+        self._exact = defaultdict(list)         # name -> indices of patterns
+        self._suffixes = defaultdict(lambda: defaultdict(list))   # length -> suffix -> indices
+        self._prefixes = defaultdict(lambda: defaultdict(list))   # length -> prefix -> indices
+        self._others = []                       # (index, compiled regex)
+        for i, pattern in enumerate(self.patterns):
+            key = pattern if case_sensitive else pattern.lower()
+            stripped = key.lstrip('*')
+            if not stripped and key:
+                self._match_all.append(i)
+            elif not _has_magic(key):
+                self._exact[key].append(i)
+            elif key[0] == '*' and not _has_magic(stripped):
+                self._suffixes[len(stripped)][stripped].append(i)
+            elif key.rstrip('*') and not _has_magic(key.rstrip('*')):
+                prefix = key.rstrip('*')
+                self._prefixes[len(prefix)][prefix].append(i)
+            else:
+                self._others.append((i, re.compile(translate(key))))
+        # The remaining patterns as one regex; m.lastindex is the outer group of the
+        # alternative that matched, since it closes last
+        if self._others:
+            self._combined = re.compile('|'.join(f'({regex.pattern})' for _, regex in self._others))
+            self._group_index = {}
+            group = 1
+            for i, regex in self._others:
+                self._group_index[group] = i
+                group += 1 + regex.groups
+        else:
+            self._combined = None
+
+    def _candidates(self, key):
+        # Indices of the patterns that match, except for the regex ones
+        found = list(self._match_all)
+        found += self._exact.get(key, ())
+        for length, table in self._suffixes.items():
+            found += table.get(key[-length:], ())
+        for length, table in self._prefixes.items():
+            found += table.get(key[:length], ())
+        return found
+
+    def match(self, name):
+        # The first pattern (in the order given) that matches name, or None
+        key = name if self.case_sensitive else name.lower()
+        found = self._candidates(key)
+        if self._combined is not None:
+            m = self._combined.match(key)
+            if m is not None:
+                found.append(self._group_index[m.lastindex])
+        return self.patterns[min(found)] if found else None
+
+    def matches(self, name):
+        # Every pattern that matches name, in the order given
+        key = name if self.case_sensitive else name.lower()
+        found = self._candidates(key)
+        found += [i for i, regex in self._others if regex.match(key)]
+        return [self.patterns[i] for i in sorted(found)]
+
+    def filter(self, names, invert=False):
+        # The names that match any pattern (or none, with invert=True), in their order.
+        # Each kind of pattern is checked over the whole list in one C-level pass.
+        names = names if isinstance(names, list) else list(names)
+        keys = names if self.case_sensitive else list(map(str.lower, names))
+        if self._match_all:
+            return [] if invert else list(names)
+        matched = set(self._exact).intersection(keys)
+        for table in (self._suffixes, self._prefixes):
+            for length, literals in table.items():
+                part = itemgetter(slice(-length, None) if table is self._suffixes else slice(length))
+                matched.update(compress(keys, map(literals.__contains__, map(part, keys))))
+        if self._combined is not None:
+            # Only names that no literal pattern matched go through the regex
+            matched.update(filter(self._combined.match, filterfalse(matched.__contains__, keys)))
+        hits = map(matched.__contains__, keys)
+        return list(compress(names, map(not_, hits) if invert else hits))
+
+
+def _has_magic(pattern):
+    return '*' in pattern or '?' in pattern or '[' in pattern
+
+
+def select(names, include, exclude=(), case_sensitive=True):
+    # Names matching an include pattern and no exclude pattern
+    names = GlobSet(include, case_sensitive).filter(names)
+    return GlobSet(exclude, case_sensitive).filter(names, invert=True) if exclude else names
+
+
+rules = GlobSet(['*.csv', 'config.*', 'Dat[0-9]*.csv', 'foo.py'])
+print(rules.filter(names))
+# ['Data1.csv', 'Data2.csv', 'config.ini', 'foo.py']
+print(rules.matches('Dat1.csv'))
+# ['*.csv', 'Dat[0-9]*.csv']
+print(GlobSet(['*.TXT'], case_sensitive=False).match('foo.txt'))
+# *.TXT
+print(select(addresses, include=['* ST', '* AVE'], exclude=['*CLARK*']))
+# ['1060 W ADDISON ST', '1039 W GRANVILLE AVE']
+
+
+# Benchmark: 300 rules against a listing of a million names
+def bench_globset(nnames=1000000, nrules=300):
+    import random
+    import time
+
+    extensions = [f'.e{i}' for i in range(nrules // 3)]
+    rules = ([f'*{ext}' for ext in extensions] + [f'build{i}*' for i in range(nrules // 3)]
+             + [f'log[0-9]_{i}?.txt' for i in range(nrules // 3)])
+    names = [random.choice(['build', 'src', 'log3_']) + str(random.randrange(nrules)) + random.choice(
+        ['.txt', '.py', random.choice(extensions)]) for _ in range(nnames)]
+
+    def timed(label, func):
+        start = time.perf_counter()
+        result = func()
+        print(f'{label:34} {time.perf_counter() - start:.3f}s')
+        return result
+
+    sample = names[:nnames // 100]
+    expected = timed(f'fnmatchcase() loops, {len(sample)} names',
+                     lambda: [n for n in sample if any(fnmatchcase(n, p) for p in rules)])
+    globset = timed('  build GlobSet', lambda: GlobSet(rules))
+    assert timed(f'GlobSet.match() loop, {len(sample)} names',
+                 lambda: [n for n in sample if globset.match(n) is not None]) == expected
+    result = timed(f'GlobSet.filter(), {nnames} names', lambda: globset.filter(names))
+    assert result[:len(expected)] == expected
+
+
+if __name__ == '__main__':
+    bench_globset()
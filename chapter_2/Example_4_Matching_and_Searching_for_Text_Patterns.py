@@ -24,6 +24,9 @@ Discussion
 
     The module-level functions keep a  cache of recently compiled patterns. it skip the compilation step.
         module-level functions in the "re module" instead. such as re.findall().
+Extension
+    literal_matcher.AhoCorasick finds all occurrences of many literal words in one pass
+    over the text, where text.find() searches for one word at a time.
 """
 
 __author__ = 'Frankie Fu'
@@ -154,35 +157,17 @@ print(datepat.match('11/12/2012'))
 # save a few lookups and extra processing by using your own compiled pattern.
 
 
+# Extension: searching for many literal words at once
+# text.find() looks for one word per pass over the text, so checking a text for any of
+# 50,000 words takes 50,000 passes. An Aho-Corasick automaton reads the text once and
+# reports every occurrence of every word, including overlapping ones.
+from literal_matcher import AhoCorasick
 
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+text = 'yeah, but no, but yeah, but no, but yeah'
+words = AhoCorasick(['yeah', 'no', 'but no'])
+print(words.search(text))
+# (0, 'yeah')
+print(list(words.find_all(text))[:4])
+# [(0, 'yeah'), (6, 'but no'), (10, 'no'), (18, 'yeah')]
+print(words.contains_any_many(['nothing', 'but', 'maybe']))
+# [True, False, False]
@@ -15,6 +15,9 @@ Discussion
     There isn't much more to regular expression search and replace than the sub() method shown.
     The trickiest part is specifying the regular expression pattern -- something that's best
     left as an exercise to the reader.
+Extension
+    Each sub() call scans the whole text. rewriter.Rewriter applies a list of rules in
+    a single scan, also to a file read in chunks.
 """
 
 __author__ = 'Frankie Fu'
@@ -70,3 +73,21 @@ print(n)
 # 2
 
 
+# Extension: many substitutions in one pass
+# A cleanup made of several sub() calls reads the text once per rule. Rewriter combines
+# the rules into one pattern, so the text is read once, and sub_file() does that for a
+# file in chunks of 1 MB, whatever its size. The group numbers in each replacement are
+# those of its own rule.
+import io
+from rewriter import Rewriter
+
+cleanup = Rewriter([(datepat, r'\3-\1-\2'), (r'PyCon', 'PyCon US'), (r'\s+\.', '.')])
+print(cleanup.sub('Today is 11/27/2012 . PyCon starts 3/13/2013.'))
+# Today is 2012-11-27. PyCon US starts 2013-3-13.
+print(Rewriter([(datepat, change_date)]).subn(text))
+# ('Today is 27 Nov 2012. PyCon starts 13 Mar 2013.', 2)
+
+out = io.StringIO()
+cleanup.sub_file(io.StringIO(text * 3), out)
+print(out.getvalue() == cleanup.sub(text * 3))
+# True
@@ -11,6 +11,9 @@ Discussion
     For simple cases, simply providing the 're.IGNORECASE' is enough to perform case-insensitive matching.
     However, be aware that this may not be enough for certain kinds of Unicode matching involving case floding.
     See Recipe 2.10 for more details.
+Extension
+    rewriter.Rewriter takes flags per rule, so case-insensitive and case-sensitive rules
+    can be applied together in one pass.
 """
 
 __author__ = 'Frankie Fu'
@@ -49,3 +52,12 @@ def matchcase(word):
 # Here is an example of using this last function:
 print(re.sub('python', matchcase('snake'), text, flags=re.IGNORECASE))
 # UPPER SNAKE, lower snake, Mixed Snake
+
+
+# Extension: case-insensitive rules among others, in one pass
+# Each rule can have its own flags; matchcase() works as the replacement of a rule.
+from rewriter import Rewriter
+
+rewriter = Rewriter([('python', matchcase('snake'), re.IGNORECASE), (r'\b(UPPER|Mixed)\b', 'Some')])
+print(rewriter.sub(text))
+# Some SNAKE, lower snake, Some Snake
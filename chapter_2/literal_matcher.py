@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Matching a string against thousands of literal prefixes, suffixes or substrings.
+
+str.startswith(tuple(choices)) and any(word in text for word in words) compare the
+string with every choice in turn, so their cost grows with the number of choices. The
+classes here are built once from the choices, after which a match costs time
+proportional to the length of the string only:
+    PrefixTrie     match_prefix(), the longest choice the string starts with
+    SuffixTrie     match_suffix(), the longest choice the string ends with
+    AhoCorasick    find_all(), every occurrence of every choice, in one pass
+Each also has a bulk method for a list of strings.
+"""
+
+__author__ = 'Frankie Fu'
+
+from collections import deque
+
+_END = ''       # key that marks the end of a word in a trie node; no character equals it
+
+
+class PrefixTrie:
+    # A trie of nested dicts, one per character
+    def __init__(self, words=()):
+        self._root = {}
+        self._size = 0
+        for word in words:
+            self.add(word)
+
+    def add(self, word, value=None):
+        # value is what a match returns, the word itself by default
+        self._insert(word, word if value is None else value)
+
+    def _insert(self, chars, value):
+        node = self._root
+        for ch in chars:
+            child = node.get(ch)
+            if child is None:
+                child = node[ch] = {}
+            node = child
+        if _END not in node:
+            self._size += 1
+        node[_END] = value
+
+    def __len__(self):
+        return self._size
+
+    def _walk(self, chars):
+        # Values of all words along the path spelled by chars, shortest first
+        node = self._root
+        if _END in node:
+            yield node[_END]
+        for ch in chars:
+            node = node.get(ch)
+            if node is None:
+                return
+            if _END in node:
+                yield node[_END]
+
+    def match_prefix(self, text):
+        # The longest word that text starts with, or None
+        node, found = self._root, self._root.get(_END)
+        for ch in text:
+            node = node.get(ch)
+            if node is None:
+                break
+            found = node.get(_END, found)
+        return found
+
+    def prefixes(self, text):
+        return list(self._walk(text))
+
+    def match_prefix_many(self, texts):
+        # match_prefix() for every string, without a method call per string
+        root = self._root
+        results = []
+        append = results.append
+        for text in texts:
+            node, found = root, root.get(_END)
+            for ch in text:
+                node = node.get(ch)
+                if node is None:
+                    break
+                found = node.get(_END, found)
+            append(found)
+        return results
+
+
+class SuffixTrie(PrefixTrie):
+    # The same trie over reversed words, walked from the end of the string
+    def add(self, word, value=None):
+        self._insert(reversed(word), word if value is None else value)
+
+    def match_suffix(self, text):
+        return self.match_prefix(reversed(text))
+
+    def suffixes(self, text):
+        return list(self._walk(reversed(text)))
+
+    def match_suffix_many(self, texts):
+        return self.match_prefix_many(map(reversed, texts))
+
+
+class AhoCorasick:
+    # A trie of all patterns where every node also has a failure link: the node for the
+    # longest proper suffix of its path that is also in the trie. When the next character
+    # has no edge, the scan follows failure links instead of starting over, so each
+    # character of the text is looked at once, however many patterns there are.
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        goto = [{}]         # node -> {char: child node}
+        out = [()]          # node -> ids of the patterns that end here
+        for pattern_id, pattern in enumerate(self.patterns):
+            if not pattern:
+                raise ValueError('patterns must not be empty')
+            node = 0
+            for ch in pattern:
+                child = goto[node].get(ch)
+                if child is None:
+                    child = goto[node][ch] = len(goto)
+                    goto.append({})
+                    out.append(())
+                node = child
+            out[node] += (pattern_id,)
+
+        # Failure links, breadth first so that shallower nodes are done first. A node
+        # also reports the patterns of the node its failure link points to.
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in goto[node].items():
+                queue.append(child)
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[child] = goto[f].get(ch, 0)
+                out[child] += out[fail[child]]
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+        self._lengths = [len(p) for p in self.patterns]
+
+    def find_all(self, text):
+        # (start, pattern) of every occurrence, overlapping ones included, in order of
+        # where they end
+        goto, fail, out = self._goto, self._fail, self._out
+        patterns, lengths = self.patterns, self._lengths
+        node = 0
+        for i, ch in enumerate(text, 1):
+            nxt = goto[node].get(ch)
+            while nxt is None and node:
+                node = fail[node]
+                nxt = goto[node].get(ch)
+            node = nxt or 0
+            for pattern_id in out[node]:
+                yield i - lengths[pattern_id], patterns[pattern_id]
+
+    def search(self, text):
+        # The leftmost occurrence as (start, pattern), or None; like text.find() for many
+        # words. Of several patterns at the same start the longest wins. find_all() goes
+        # by end position, so the scan stops once no later match can start further left.
+        best = None
+        longest = max(self._lengths, default=0)
+        for start, pattern in self.find_all(text):
+            if best is not None and start + len(pattern) - longest > best[0]:
+                break
+            if best is None or start < best[0] or (start == best[0] and len(pattern) > len(best[1])):
+                best = (start, pattern)
+        return best
+
+    def find_all_many(self, texts):
+        return [list(self.find_all(text)) for text in texts]
+
+    def contains_any_many(self, texts):
+        # Whether each string contains any of the patterns; the first match found is enough
+        find_all = self.find_all
+        return [next(find_all(text), None) is not None for text in texts]
+
+
+# Benchmark with 50k prefixes and suffixes, classifying 20k URLs
+def bench_literal_matcher(npatterns=50000, ntexts=20000):
+    import random
+    import time
+
+    hosts = [f'https://host{i}.example.com/' for i in range(npatterns)]
+    suffixes = [f'.{i:x}ext' for i in range(npatterns)]
+    words = [f'token{i}z' for i in range(npatterns)]
+    urls = [random.choice(hosts) + f'path/{random.choice(words) if random.random() < 0.5 else "file"}'
+            + random.choice(suffixes) for _ in range(ntexts)]
+
+    def timed(label, func):
+        start = time.perf_counter()
+        result = func()
+        print(f'{label:38} {time.perf_counter() - start:.3f}s')
+        return result
+
+    host_tuple, suffix_tuple = tuple(hosts), tuple(suffixes)
+    expected = timed('startswith(tuple)', lambda: [url.startswith(host_tuple) for url in urls])
+    trie = timed('  build PrefixTrie', lambda: PrefixTrie(hosts))
+    result = timed('PrefixTrie.match_prefix_many()', lambda: trie.match_prefix_many(urls))
+    assert [r is not None for r in result] == expected
+
+    expected = timed('endswith(tuple)', lambda: [url.endswith(suffix_tuple) for url in urls])
+    trie = SuffixTrie(suffixes)
+    result = timed('SuffixTrie.match_suffix_many()', lambda: trie.match_suffix_many(urls))
+    assert [r is not None for r in result] == expected
+
+    sample = urls[:ntexts // 20]
+    expected = timed(f'any(word in url), {len(sample)} urls', lambda: [any(w in url for w in words) for url in sample])
+    automaton = timed('  build AhoCorasick', lambda: AhoCorasick(words))
+    result = timed(f'AhoCorasick, {len(sample)} urls', lambda: automaton.contains_any_many(sample))
+    assert result == expected
+
+
+if __name__ == '__main__':
+    bench_literal_matcher()
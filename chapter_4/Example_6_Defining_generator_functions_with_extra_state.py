@@ -18,6 +18,9 @@ Discussion
     # Note that
     It might require an extra step of calling iter() if you are going to drive iteration
     using a technique other than a for loop.
+Extension
+    Because the history is just an attribute, it can be swapped for a persistent one:
+    chapter_1's MmapRingBuffer keeps it in a memory mapped file across restarts.
 """
 
 __author__ = 'Frankie Fu'
@@ -58,3 +61,53 @@ lines = linehistory(f)
 it = iter(lines)
 print(next(it))
 print(next(it))
+
+
+# Extension: a history that survives restarts
+# linehistory only needs append() and iteration from self.history, so a subclass can
+# keep it in chapter_1's ring_buffer.MmapRingBuffer instead of a deque. The module is
+# found by adding its directory to sys.path (see chapter 10, Example_9).
+import os
+import struct
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'chapter_1'))
+from ring_buffer import MmapRingBuffer
+
+_LINENO = struct.Struct('<Q')
+
+
+def _encode_entry(entry):
+    lineno, line = entry
+    return _LINENO.pack(lineno) + line.encode('utf-8')
+
+
+def _decode_entry(data):
+    return _LINENO.unpack_from(data)[0], bytes(data[_LINENO.size:]).decode('utf-8')
+
+
+class persistent_linehistory(linehistory):
+    def __init__(self, lines, filename, histlen=3, max_line=256):
+        # max_line is in bytes of UTF-8; longer lines raise ValueError
+        self.lines = lines
+        self.history = MmapRingBuffer(filename, histlen, slot_size=max_line + _LINENO.size + 4,
+                                      encode=_encode_entry, decode=_decode_entry)
+
+    def close(self):
+        self.history.close()
+
+
+import tempfile
+
+with tempfile.TemporaryDirectory() as tmp:
+    history_file = os.path.join(tmp, 'somefile.history')
+    with open('./data/somefile.txt') as f:
+        lines = persistent_linehistory(f, history_file)
+        for line in lines:
+            pass
+        lines.close()
+    # Later, in another run of the program
+    lines = persistent_linehistory([], history_file)
+    print(list(lines.history))
+    # [(6, 'javascript\n'), (7, 'jquery\n'), (8, 'ruby')]
+    lines.close()